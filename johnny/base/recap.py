@@ -9,10 +9,6 @@ from typing import Optional, Tuple
 import datetime
 import logging
 
-import seaborn as sns
-
-sns.set()
-
 from johnny.base import chains as chainslib
 from johnny.base import config as configlib
 from johnny.base.etl import Table, Record
@@ -40,17 +36,23 @@ def get_chains_at_date(
 ) -> Tuple[Table, Table]:
     """Filter and identify chains active on a given date."""
 
+    # Isolate the transactions on the date, in a single scan of the table.
+    day_transactions = transactions.select(
+        "datetime", lambda v: v.date() == date
+    ).cache()
+
     # A set of chain ids with transactions on the date.
     # This is used to figure out if an adjustment took place on a chain.
     traded_chains = set(
-        transactions.selectne("rowtype", txnlib.Type.Mark)
-        .select(lambda r: r.datetime.date() == date)
-        .values("chain_id")
+        day_transactions.selectne("rowtype", txnlib.Type.Mark).values("chain_id")
     )
 
     # Infer the action of the chain based on the status and date extents. Note
-    # that this may return None, in which case the chain is to be excluded.
+    # that this may return None, in which case the chain is to be excluded,
+    # e.g., if the date is outside the chain's extents.
     def infer_action(r: Record) -> Optional[str]:
+        if not r.mindate <= date <= r.maxdate:
+            return None
         if date == r.maxdate and r.status in {"FINAL", "CLOSED"}:
             if date == r.mindate:
                 action = "Daytrade"
@@ -75,14 +77,13 @@ def get_chains_at_date(
         return chain.comment if chain else ""
 
     # Filter commissions & fees per day.
-    commfees = transactions.select(lambda r: r.datetime.date() == date).aggregate(
+    commfees = day_transactions.aggregate(
         "chain_id", {"commissions": ("commissions", sum), "fees": ("fees", sum)}
     )
 
     # Process the chains.
     chains = (
-        chains.select(lambda r: r.mindate <= date <= r.maxdate)
-        .addfield("action", infer_action, index=0)
+        chains.addfield("action", infer_action, index=0)
         .selecttrue("action")
         .addfield("k", lambda r: ACTIONS.get(r.action), index=0)
         .sort(["k", "chain_id"])
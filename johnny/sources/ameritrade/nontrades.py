@@ -15,78 +15,79 @@ from johnny.sources.ameritrade import transactions as txnlib
 Q2 = Decimal("0.01")
 
 
+_SYMBOL_RE = re.compile(r"~([A-Z]+)\s*$")
+_COURTESY_RE = re.compile(r"(courtesy|courteys) +(adjustment|credit)", flags=re.I)
+_MARK_TO_MARKET_RE = re.compile(r"mark to market at .* official settlement price")
+
+
 def GetSymbol(rec: Record) -> str:
-    mobj = re.search(r"~([A-Z]+)\s*$", rec.description)
+    mobj = _SYMBOL_RE.search(rec.description)
     return mobj.group(1) if mobj else None
 
 
+# Row type by description prefix, for each of the native types that can be
+# classified from a literal prefix of their description.
+_PREFIX_ROWTYPES = {
+    "BAL": [
+        ("Cash balance at the start", nontrades.Type.Balance),
+        ("Futures cash balance at the start", nontrades.Type.FuturesBalance),
+    ],
+    "DOI": [
+        ("FREE BALANCE INTEREST ADJUSTMENT", nontrades.Type.CreditInterest),
+        ("MARGIN INTEREST ADJUSTMENT", nontrades.Type.MarginInterest),
+        # Note: Ordinary dividends are processed as transactions.
+    ],
+    "EFN": [
+        (
+            "CLIENT REQUESTED ELECTRONIC FUNDING RECEIPT",
+            nontrades.Type.ExternalTransfer,
+        ),
+        (
+            "CLIENT REQUESTED ELECTRONIC FUNDING DISBURSEMENT",
+            nontrades.Type.ExternalTransfer,
+        ),
+    ],
+    "JRN": [
+        ("MISCELLANEOUS JOURNAL ENTRY", nontrades.Type.Adjustment),
+        ("MARK TO THE MARKET", nontrades.Type.FuturesMarkToMarket),
+        ("INTRA-ACCOUNT TRANSFER", nontrades.Type.InternalTransfer),
+        ("HARD TO BORROW FEE", nontrades.Type.HardToBorrowFee),
+    ],
+    "RAD": [
+        ("CASH ALTERNATIVES INTEREST", nontrades.Type.CreditInterest),
+        ("INTERNAL TRANSFER BETWEEN ACCOUNTS", nontrades.Type.InternalTransfer),
+    ],
+    "WIN": [
+        ("THIRD PARTY", nontrades.Type.ExternalTransfer),
+    ],
+    "WOU": [
+        ("WIRE OUTGOING", nontrades.Type.ExternalTransfer),
+    ],
+}
+
+
 def GetRowType(rec: Record) -> nontrades.Type:
     Type = nontrades.Type
     rtype = rec.type
     if not rtype:
         raise ValueError(f"Invalid row without a 'type' field: {rec}")
 
-    if rtype == "BAL":
-        if rec.description.startswith("Cash balance at the start"):
-            return Type.Balance
-        elif rec.description.startswith("Futures cash balance at the start"):
-            return Type.FuturesBalance
-
-    elif rtype == "ADJ":
-        if re.match(
-            r"(courtesy|courteys) +(adjustment|credit)", rec.description, flags=re.I
-        ):
+    if rtype == "ADJ":
+        if _COURTESY_RE.match(rec.description):
             return Type.Adjustment
-        elif re.search(
-            r"mark to market at .* official settlement price", rec.description
-        ):
+        elif _MARK_TO_MARKET_RE.search(rec.description):
             return Type.FuturesMarkToMarket
 
-    elif rtype == "DOI":
-        if rec.description.startswith("FREE BALANCE INTEREST ADJUSTMENT"):
-            return Type.CreditInterest
-        elif rec.description.startswith("MARGIN INTEREST ADJUSTMENT"):
-            return Type.MarginInterest
-        elif rec.description.startswith("ORDINARY DIVIDEND"):
-            return Type.Cash
-
-    elif rtype == "EFN":
-        if rec.description.startswith("CLIENT REQUESTED ELECTRONIC FUNDING RECEIPT"):
-            return Type.ExternalTransfer
-        elif rec.description.startswith(
-            "CLIENT REQUESTED ELECTRONIC FUNDING DISBURSEMENT"
-        ):
-            return Type.ExternalTransfer
-
     elif rtype == "FSWP":
         if rec.subaccount == "Cash":
             return Type.Sweep
         elif rec.subaccount == "Futures":
             return Type.FuturesSweep
 
-    elif rtype == "JRN":
-        if rec.description.startswith("MISCELLANEOUS JOURNAL ENTRY"):
-            return Type.Adjustment
-        elif rec.description.startswith("MARK TO THE MARKET"):
-            return Type.FuturesMarkToMarket
-        elif rec.description.startswith("INTRA-ACCOUNT TRANSFER"):
-            return Type.InternalTransfer
-        elif rec.description.startswith("HARD TO BORROW FEE"):
-            return Type.HardToBorrowFee
-
-    elif rtype == "RAD":
-        if rec.description.startswith("CASH ALTERNATIVES INTEREST"):
-            return Type.CreditInterest
-        elif rec.description.startswith("INTERNAL TRANSFER BETWEEN ACCOUNTS"):
-            return Type.InternalTransfer
-
-    elif rtype == "WIN":
-        if rec.description.startswith("THIRD PARTY"):
-            return Type.ExternalTransfer
-
-    elif rtype == "WOU":
-        if rec.description.startswith("WIRE OUTGOING"):
-            return Type.ExternalTransfer
+    else:
+        for prefix, rowtype in _PREFIX_ROWTYPES.get(rtype, ()):
+            if rec.description.startswith(prefix):
+                return rowtype
 
     raise ValueError(f"Unknown {rtype} row: {rec}")
 
@@ -114,14 +115,12 @@ def ConvertNonTrades(other: Table, account_id: str) -> Table:
 
 
 def ImportNonTrades(config: config_pb2.Config) -> petl.Table:
-    treasuries_table = txnlib.ImportTreasuries(config)
-
     pattern = path.expandvars(config.thinkorswim_account_statement_csv_file_pattern)
     fnmap = discovery.GetLatestFilePerYear(pattern)
     other_list = []
     for year, filename in sorted(fnmap.items()):
-        _, other = txnlib.GetTransactions(filename, treasuries_table)
-        other = other.select(lambda r, y=year: r.datetime.year == y)
+        _, other = txnlib.ImportStatement(config, filename)
+        other = other.select("datetime", lambda v, y=year: v.year == y)
         other_list.append(other)
     table = petl.cat(*other_list)
 
@@ -42,15 +42,17 @@ __license__ = "GNU GPLv2"
 
 from os import path
 import argparse
+import csv
+import datetime
 from decimal import Decimal
+import functools
 import itertools
 import logging
 import re
-from typing import List, Tuple, Optional, NamedTuple
+from typing import Iterable, List, Tuple, Optional, NamedTuple
 
 from dateutil.parser import parse
 import click
-from more_itertools import first
 
 from mulmat import months
 from mulmat import multipliers
@@ -75,13 +77,22 @@ ZERO = Decimal(0)
 FIELDS = ["Delta", "Gamma", "Theta", "Vega", "Beta", "Net Liq", "P/L Open", "P/L Day"]
 
 
+# Decimal conversion of the numerical columns. Betas, marks and zero P/L values
+# repeat across the rows of a statement, so the conversions are cached.
+_ToDecimal = functools.lru_cache(maxsize=4096)(ToDecimal)
+
+# Quantities are signed integers, with a small set of distinct values.
+_ToQuantity = functools.lru_cache(maxsize=1024)(Decimal)
+
+
+# Placeholder values rendered by TOS for greeks not (yet) computed.
+_SPECIAL_VALUES = {"loading": None, "<empty>": ZERO}
+
+
 def SafeToDecimal(string: str) -> Optional[Decimal]:
-    if string == "loading":
-        return None
-    elif string == "<empty>":
-        return ZERO
-    else:
-        return ToDecimal(string)
+    if string in _SPECIAL_VALUES:
+        return _SPECIAL_VALUES[string]
+    return _ToDecimal(string)
 
 
 class Group(NamedTuple):
@@ -97,106 +108,129 @@ class Group(NamedTuple):
     table: Table
 
 
-def SplitGroups(lines: List[str]) -> List[Group]:
-    """Split the report into named groups."""
+def _AddGroup(
+    group_list: List[Group],
+    name: Optional[str],
+    subname: Optional[str],
+    rows: List[str],
+):
+    """Parse the accumulated rows of a subgroup, if complete, into a table."""
+    if name and subname and rows:
+        table = petl.wrap(list(csv.reader(rows)))
+        group_list.append(Group(name, subname, table))
 
-    # Clean up the list of lines before processing them.
-    rows = []
+
+def SplitGroups(lines: Iterable[str]) -> List[Group]:
+    """Split the report into named groups.
+
+    The lines are consumed once, so this accepts an open file object.
+    """
+
+    # Split up the groups into subtables. All the markers are literal prefixes,
+    # so we test those before falling through to a regular row.
+    group_list: List[Group] = []
+    name, subname, group = None, None, []
     for line in lines:
         # Remove initial BOM marker line.
         if line.startswith("\ufeff"):
             continue
         # Remove bottom subtable that contains only summaries.
-        if re.match("Cash & Sweep Vehicle", line):
+        if line.startswith("Cash & Sweep Vehicle"):
             break
-        rows.append(line.rstrip())
 
-    def AddGroup():
-        if name and subname and group:
-            source = petl.MemorySource("\n".join(group).encode("utf8"))
-            group_list.append(Group(name, subname, petl.fromcsv(source)))
-
-    # Split up the groups into subtables.
-    group_list: List[Group] = []
-    name, subname, group = None, None, []
-    for row in rows:
-        # Skip all empty rows, and reset the group if they occur.
+        # Skip all empty rows.
+        row = line.rstrip()
         if not row:
             continue
 
         # Reset the current group.
-        match = re.fullmatch(r'Group "(.*)"', row)
-        if match:
-            AddGroup()
-            name, subname, group = match.group(1), None, []
+        if row.startswith('Group "') and row.endswith('"') and len(row) > 7:
+            _AddGroup(group_list, name, subname, group)
+            name, subname, group = row[7:-1], None, []
             continue
 
         # Skip useless header.
-        match = re.match(r"(Equities) and Equity Options", row)
-        if match:
-            AddGroup()
-            subname, group = match.group(1), []
+        if row.startswith("Equities and Equity Options"):
+            _AddGroup(group_list, name, subname, group)
+            subname, group = "Equities", []
             continue
-        match = re.match(r"(Futures) and Futures Options", row)
-        if match:
-            AddGroup()
-            subname, group = match.group(1), []
+        if row.startswith("Futures and Futures Options"):
+            _AddGroup(group_list, name, subname, group)
+            subname, group = "Futures", []
             continue
 
         group.append(row)
 
     # Final table.
-    AddGroup()
+    _AddGroup(group_list, name, subname, group)
 
     return group_list
 
 
-_FUTSYM = "(/[A-Z0-9]+[FGHJKMNQUVXZ]2[0-9])"
+_FUTSYM = "/[A-Z0-9]+[FGHJKMNQUVXZ]2[0-9]"
 
+# All the instrument descriptions, in a single alternation. The branch that
+# matched is dispatched on with 'lastgroup'. Anything else is an equity.
+_INSTRUMENT_RE = re.compile(
+    # Future Option, e.g., "1/125000 JUN 21 (European) /EUUM21 1.13 PUT"
+    r"(?P<futopt>1/(?P<futopt_multiplier>\d+) [A-Z]{3} 2\d(?: \([^)]*\))? "
+    rf"(?P<futopt_expcode>{_FUTSYM}) "
+    r"(?P<futopt_strike>[0-9.]+) (?P<futopt_putcall>PUT|CALL))"
+    # Equity Option, e.g., "100 (Weeklys) 4 JUN 21 4130 CALL"
+    r"|(?P<eqopt>100(?: \([^)]*\))? (?P<eqopt_expiration>\d+ [A-Z]{3} 2\d) "
+    r"(?P<eqopt_strike>[0-9.]+) (?P<eqopt_putcall>PUT|CALL))"
+    # Future, e.g., "2-Year U.S. Treasury Note Futures,Jun-2021,ETH (prev. /ZTM1)"
+    r"|(?P<fut>.* \(prev. (?P<fut_symbol>/.*)\)\Z)"
+)
 
+# Expiration code to underlying resolution. Many options share the same few
+# futures months.
+_GetUnderlying = functools.lru_cache(maxsize=512)(months.get_underlying)
+
+
+# Note: Instruments are immutable and the same descriptions occur under each
+# underlying root, and again in the statements of following days, so the parsed
+# values are cached for the lifetime of the process.
+@functools.lru_cache(maxsize=8192)
 def ParseInstrumentDescription(string: str, symroot: str) -> instrument.Instrument:
     """Parse an instrument description to a Beansym."""
 
+    match = _INSTRUMENT_RE.match(string)
+    kind = match.lastgroup if match else None
+
     # Handle Future Option, e.g.,
     # 1/125000 JUN 21 (European) /EUUM21 1.13 PUT
-    match = re.match(
-        r"1/(\d+) ([A-Z]{3}) (2\d)(?: \(([^)]*)\))? "
-        rf"{_FUTSYM} ([0-9.]+) (PUT|CALL)",
-        string,
-    )
-    if match:
-        (multiplier, month, year, subtype, expcode, strike, putcall) = match.groups()
-
-        underlying = months.get_underlying(expcode)
+    if kind == "futopt":
+        expcode = match.group("futopt_expcode")
+        underlying = _GetUnderlying(expcode)
         return instrument.Instrument(
             underlying=underlying,
             expcode=expcode[1:],
-            putcall=putcall[0],
-            strike=Decimal(strike),
-            multiplier=Decimal(multiplier),
+            putcall=match.group("futopt_putcall")[0],
+            strike=Decimal(match.group("futopt_strike")),
+            multiplier=Decimal(match.group("futopt_multiplier")),
         )
 
     # Handle Equity Option, e.g.,
     # 100 (Weeklys) 4 JUN 21 4130 CALL
-    match = re.match(
-        r"100(?: \(([^)]*)\))? (\d+ [A-Z]{3} 2\d) " r"([0-9.]+) (PUT|CALL)", string
-    )
-    if match:
-        subtype, day_month_year, strike, putcall = match.groups()
-        expiration = parse(day_month_year).date()
+    if kind == "eqopt":
+        day_month_year = match.group("eqopt_expiration")
+        try:
+            expiration = datetime.datetime.strptime(day_month_year, "%d %b %y").date()
+        except ValueError:
+            expiration = parse(day_month_year).date()
         return instrument.Instrument(
             underlying=symroot,
             expiration=expiration,
-            putcall=putcall[0],
-            strike=Decimal(strike),
+            putcall=match.group("eqopt_putcall")[0],
+            strike=Decimal(match.group("eqopt_strike")),
             multiplier=100,
         )
 
     # Handle Future, e.g.,
     # 2-Year U.S. Treasury Note Futures,Jun-2021,ETH (prev. /ZTM1)
-    match = re.fullmatch(r"(.*) \(prev. (/.*)\)", string)
-    if match:
-        symbol = match.group(2)
+    if kind == "fut":
+        symbol = match.group("fut_symbol")
         underlying = symbol[:-1] + "2" + symbol[-1:]
         short_under = underlying[:-3]
         multiplier = multipliers.MULTIPLIERS[short_under]
@@ -216,9 +250,41 @@ def InferCostFromPnl(rec: Record) -> Decimal:
     return rec.pnl_open - rec.net_liq
 
 
-def InferCostFromTradePrice(rec: Record) -> Decimal:
+def InferCostFromTradePrice(
+    quantity: Decimal, multiplier: Decimal, price: Decimal
+) -> Decimal:
     """Infer the cost from the Quantity and Trade Price."""
-    return -rec.quantity * rec._instrument.multiplier * rec.price
+    return -quantity * multiplier * price
+
+
+def GetIndexPrice(
+    quantity: Decimal,
+    multiplier: Decimal,
+    unit_delta: Decimal,
+    index_delta: Decimal,
+    mark: Decimal,
+    beta: Decimal,
+) -> Decimal:
+    # Delta: is SPY-weighted dollar-deltas from TW.
+    # Beta: Morningstar betas.
+    delta = quantity * multiplier * unit_delta
+    return (delta / index_delta * mark * beta).quantize(Q)
+
+
+# Output columns of the folded group tables.
+_FOLDED_FIELDS = (
+    "symbol",
+    "quantity",
+    "price",
+    "mark",
+    "cost",
+    "net_liq",
+    "pnl_open",
+    "pnl_day",
+    "unit_delta",
+    "beta",
+    "index_price",
+)
 
 
 def FoldInstrument(table: Table) -> Table:
@@ -238,69 +304,69 @@ def FoldInstrument(table: Table) -> Table:
     # - The remaining rows are actual positions. If positions are all options or
     #   futures options, there will also be rows dedicated to the corresponding
     #   underlyings, even if their quantity is zero. Remove those.
+    #
+    # This is done in a single pass over the rows, carrying the underlying
+    # (and strategy) values down to the position rows.
+    #
+    # The rows are read as plain tuples, with the column indexes resolved once
+    # from the header, rather than wrapping each of them in a petl record.
+    header = table.header()
+    width = len(header)
+    index = {name: i for i, name in enumerate(header)}
+
+    rows = []
+    symroot = None
+    for row in table.data():
+        if len(row) < width:
+            row = tuple(row) + (None,) * (width - len(row))
 
-    table = (
-        table
         # Fold the special underlying row.
-        .addfield(
-            "symroot", lambda r: r["Instrument"] if bool(r["BP Effect"]) else None
-        )
-        .filldown("symroot")
-        .selectfalse("BP Effect")
-        # Folder the strategy row.
-        .addfield("strategy", lambda r: r["Instrument"] if not r["Qty"] else None)
-        .filldown("strategy")
-        .selecttrue("Qty")
-        .convert("Qty", Decimal)
-        .selectne("Qty", ZERO)
-        .rename("Qty", "quantity")
+        if row[index["BP Effect"]]:
+            symroot = row[index["Instrument"]]
+            continue
+        # Fold the strategy row (unused for now).
+        if not row[index["Qty"]]:
+            continue
+        quantity = _ToQuantity(row[index["Qty"]])
+        if quantity == ZERO:
+            continue
+
         # Synthetize our symbol.
-        .addfield(
-            "_instrument", lambda r: ParseInstrumentDescription(r.Instrument, r.symroot)
-        )
-        .addfield("symbol", lambda r: str(r._instrument))
-        # Normalize names of remaining fields.
-        .rename("Trade Price", "price")
-        .rename("Mark", "mark")
-        .rename("Net Liq", "net_liq")
-        .rename("P/L Open", "pnl_open")
-        .rename("P/L Day", "pnl_day")
-        .rename("OptionDelta", "unit_delta")
-        .rename("Beta", "beta")
+        inst = ParseInstrumentDescription(row[index["Instrument"]], symroot)
+
         # Convert numbers.
-        .convert(["price", "mark", "net_liq", "pnl_open", "pnl_day"], ToDecimal)
-        .convert(["unit_delta", "beta", "Delta"], SafeToDecimal)
-        .addfield("index_price", GetIndexPrice)
+        price = _ToDecimal(row[index["Trade Price"]])
+        mark = _ToDecimal(row[index["Mark"]])
+        unit_delta = SafeToDecimal(row[index["OptionDelta"]])
+        beta = SafeToDecimal(row[index["Beta"]])
+        index_delta = SafeToDecimal(row[index["Delta"]])
+        index_price = GetIndexPrice(
+            quantity, inst.multiplier, unit_delta, index_delta, mark, beta
+        )
+
         # Make up missing 'cost' field.
         #
         # Unfortunately the cost isn't provided directly, but we infer it
         # from the rest of the information.
-        .addfield("cost", InferCostFromTradePrice)
-        .cutout("_instrument")
-        # Clean up the final table.
-        .cut(
-            "symbol",
-            "quantity",
-            "price",
-            "mark",
-            "cost",
-            "net_liq",
-            "pnl_open",
-            "pnl_day",
-            "unit_delta",
-            "beta",
-            "index_price",
+        cost = InferCostFromTradePrice(quantity, inst.multiplier, price)
+
+        rows.append(
+            (
+                str(inst),
+                quantity,
+                price,
+                mark,
+                cost,
+                _ToDecimal(row[index["Net Liq"]]),
+                _ToDecimal(row[index["P/L Open"]]),
+                _ToDecimal(row[index["P/L Day"]]),
+                unit_delta,
+                beta,
+                index_price,
+            )
         )
-    )
-
-    return ReduceFragmentedPositions(table)
-
 
-def GetIndexPrice(r: Record) -> Decimal:
-    # Delta: is SPY-weighted dollar-deltas from TW.
-    # Beta: Morningstar betas.
-    delta = r["quantity"] * r._instrument.multiplier * r["unit_delta"]
-    return (delta / r["Delta"] * r["mark"] * r["beta"]).quantize(Q)
+    return ReduceFragmentedPositions(petl.wrap([_FOLDED_FIELDS] + rows))
 
 
 def ReduceFragmentedPositions(table: Table) -> Table:
@@ -317,11 +383,25 @@ def ReduceFragmentedPositions(table: Table) -> Table:
     # /ZFU21              -1        123.7734375   124.390625    123.7734375   -101.57  -617.19   -101.57
     # /ZTU21              -2        110.36328125  110.28515625  220.72656250  -40.63   312.50    -40.63
     #
-    agg = {}
-    for key in table.header()[1:]:
-        func = first if key in {"price", "mark"} else sum
-        agg[key] = (key, func)
-    return table.aggregate("symbol", agg)
+    #
+    # The first price and mark are kept and the other columns are summed, in a
+    # single pass over the rows.
+    header = table.header()
+    sum_indexes = [
+        index
+        for index, key in enumerate(header)
+        if index > 0 and key not in {"price", "mark"}
+    ]
+    reduced = {}
+    for row in table.data():
+        symbol = row[0]
+        acc = reduced.get(symbol)
+        if acc is None:
+            reduced[symbol] = list(row)
+        else:
+            for index in sum_indexes:
+                acc[index] += row[index]
+    return petl.wrap([header] + [reduced[symbol] for symbol in sorted(reduced)])
 
 
 def GetPositions(filename: str) -> Table:
@@ -329,15 +409,16 @@ def GetPositions(filename: str) -> Table:
 
     debug = False
 
-    # Read the positions table.
+    # Read the positions table, preparing tables for aggregation, inserting
+    # groups and stripping subtables (no reason to treat Equities and Futures
+    # distinctly).
     with open(filename) as csvfile:
-        lines = csvfile.readlines()
+        groups = SplitGroups(csvfile)
 
-    # Prepare tables for aggregation, inserting groups and stripping subtables
-    # (no reason to treat Equities and Futures distinctly).
-    groups = SplitGroups(lines)
-
-    tables = []
+    # Fold each group and prepend the account number and group name to its
+    # rows, directly in the final field order.
+    account = utils.GetAccountNumber(filename)
+    rows = []
     for x in groups:
         if x.table.nrows() == 0:
             continue
@@ -345,17 +426,16 @@ def GetPositions(filename: str) -> Table:
         if debug:
             print("-" * 100)
             print(x.table.lookallstr())
-        gtable = FoldInstrument(x.table).addfield("group", x.name, index=0)
+        gtable = FoldInstrument(x.table)
         if debug:
             print(gtable.lookallstr())
 
-        tables.append(gtable)
-
-    # Add the account number.
-    account = utils.GetAccountNumber(filename)
-    table = petl.cat(*tables).addfield("account", account, index=0).cut(poslib.FIELDS)
+        header = gtable.header()
+        indexes = [header.index(field) for field in poslib.FIELDS[2:]]
+        for row in gtable.data():
+            rows.append((account, x.name, *[row[index] for index in indexes]))
 
-    return table
+    return petl.wrap([poslib.FIELDS] + rows)
 
 
 def ImportPositions(config: config_pb2.Config) -> Table:
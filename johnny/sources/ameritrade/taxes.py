@@ -2,7 +2,10 @@
 """
 
 from decimal import Decimal
+import datetime
+import functools
 import re
+from typing import Dict
 
 import petl
 import dateutil.parser
@@ -17,22 +20,55 @@ Q = Decimal("0.01")
 ZERO = Decimal(0)
 
 
+def _to_cents(value) -> Decimal:
+    """Convert a spreadsheet amount to a Decimal rounded to cents."""
+    if value is None:
+        return ZERO
+    if isinstance(value, (int, float)):
+        # Formatting rounds the exact binary value half-even, like quantize()
+        # would, without going through an unrounded Decimal first.
+        return Decimal(format(value, ".2f"))
+    return Decimal(value).quantize(Q)
+
+
+def _read_xlsx(filename: str, **kwargs) -> Table:
+    """Read a spreadsheet's rows into memory.
+
+    petl.fromxlsx() reloads the workbook every time its view is iterated, which
+    the pipelines and validations below do several times. (Note that calling
+    list() on the view directly would also size it with an extra pass.)
+    """
+    return petl.wrap(list(iter(petl.fromxlsx(filename, **kwargs))))
+
+
+def _field_names(table: Table, renames: Dict[str, str]) -> Dict[str, str]:
+    """Map the spreadsheet headers to lowercase field names, then rename some."""
+    mapping = {}
+    for key in table.fieldnames():
+        name = re.sub(r"[^A-Za-z_]", "", key.lower().replace(" ", "_"))
+        mapping[key] = renames.get(name, name)
+    return mapping
+
+
 def read_worksheet(filename: str) -> Table:
     """Parse the Ameritrade worksheet ("without wash sales adjustments")."""
 
-    table = petl.fromxlsx(filename)
-    lowercase = {
-        key: re.sub(r"[^A-Za-z_]", "", key.lower().replace(" ", "_"))
-        for key in table.fieldnames()
-    }
+    table = _read_xlsx(filename)
+    names = _field_names(table, {"st_gain": "st_gain_loss", "lt_gain": "lt_gain_loss"})
     worksheet = (
-        table.rename(lowercase)
+        table.rename(names)
         .convert(
-            ["proceeds", "cost", "gain_adj", "st_gain", "lt_gain", "or_gain"],
-            lambda v: ZERO if v is None else Decimal(v).quantize(Q),
+            [
+                "proceeds",
+                "cost",
+                "gain_adj",
+                "st_gain_loss",
+                "lt_gain_loss",
+                "or_gain",
+            ],
+            _to_cents,
         )
-        .addfield("gain_loss", lambda r: r.st_gain + r.lt_gain)
-        .rename({"st_gain": "st_gain_loss", "lt_gain": "lt_gain_loss"})
+        .addfield("gain_loss", lambda r: r.st_gain_loss + r.lt_gain_loss)
         .selectne("security", "Total:")
         .addfield("60/40", lambda r: r.security.endswith("*"))
         .convert("security", lambda v: v.rstrip("*"))
@@ -51,27 +87,21 @@ def read_worksheet(filename: str) -> Table:
 def read_form8949(filename: str) -> Table:
     """Parse the Ameritrade Form 8949 ("with wash sales adjustments")."""
 
-    table = petl.fromxlsx(filename, sheet="Report for 8949")
-    lowercase = {
-        key: re.sub(r"[^A-Za-z_]", "", key.lower().replace(" ", "_"))
-        for key in table.fieldnames()
-    }
+    table = _read_xlsx(filename, sheet="Report for 8949")
+    names = _field_names(
+        table,
+        {
+            "shares_sold": "quantity",
+            "gainloss": "gain_loss",
+            "gainloss_adjustment": "gain_adj",
+            "stlt": "term",
+        },
+    )
     form8949 = (
-        table.rename(lowercase)
+        table.rename(names)
         .selectne("close_date", None)
-        .convert("shares_sold", int)
-        .convert(
-            ["proceeds", "cost", "gainloss", "gainloss_adjustment"],
-            lambda v: ZERO if v is None else Decimal(v).quantize(Q),
-        )
-        .rename(
-            {
-                "shares_sold": "quantity",
-                "gainloss": "gain_loss",
-                "gainloss_adjustment": "gain_adj",
-                "stlt": "term",
-            }
-        )
+        .convert("quantity", int)
+        .convert(["proceeds", "cost", "gain_loss", "gain_adj"], _to_cents)
         .addfield(
             "symbol",
             lambda r: _parse_security_description(r.security),
@@ -92,21 +122,30 @@ _WRAPS = {
 }
 
 
+_OPTION_DESC_RE = re.compile(
+    r"([A-Z0-9]+) ([A-Z][a-z][a-z] \d+ \d{4}) ([0-9.]+) (Call|Put)"
+)
+_PAREN_DESC_RE = re.compile(r".* \((.*)\)")
+
+
+# Note: The same security shows up on each of its lots and wash sale
+# adjustments, so the parsed descriptions are cached.
+@functools.lru_cache(maxsize=None)
 def _parse_security_description(description: str) -> str:
-    match = re.fullmatch(
-        r"([A-Z0-9]+) ([A-Z][a-z][a-z] \d+ \d{4}) ([0-9.]+) (Call|Put)",
-        description,
-    )
+    match = _OPTION_DESC_RE.fullmatch(description)
     if match:
         und, expiration, strike, putcall = match.groups()
         und = _WRAPS.get(und, und)
-        expiration = dateutil.parser.parse(expiration).date()
+        try:
+            expiration = datetime.datetime.strptime(expiration, "%b %d %Y").date()
+        except ValueError:
+            expiration = dateutil.parser.parse(expiration).date()
         if strike.endswith(".0"):
             strike = strike[:-2]
         strike = ToDecimal(strike)
         return f"{und}_{expiration:%y%m%d}_{putcall[0]}{strike}"
 
-    match = re.fullmatch(r".* \((.*)\)", description)
+    match = _PAREN_DESC_RE.fullmatch(description)
     if match:
         return match.group(1)
 
@@ -19,7 +19,7 @@ __copyright__ = "Copyright (C) 2021  Martin Blais"
 __license__ = "GNU GPLv2"
 
 from decimal import Decimal
-from functools import partial
+from functools import lru_cache, partial
 from itertools import chain
 from os import path
 from typing import Any, Dict, List, Optional, Tuple, Union, Iterable
@@ -63,41 +63,40 @@ debug = False
 ONE = Decimal(1)
 ZERO = Decimal(0)
 Q3 = Decimal("0.001")
+ZERO_Q3 = ZERO.quantize(Q3)
 Q4 = Decimal("0.0001")
 
 
+# Amounts, fees, strikes and multipliers repeat a lot; parse each distinct string
+# to a Decimal once.
+_ToDecimal = lru_cache(maxsize=4096)(number.ToDecimal)
+_Decimal = lru_cache(maxsize=4096)(Decimal)
+
+
 # Include the commnissions on the last leg. This matches the worksheets.
 DO_COMMISSIONS_LAST_LEG = False
 
 
+def _CheckNoTradeOverlap(nontrade: Table, trade_hist: Table):
+    """Check that none of the non-trade rows occur at the time of a trade."""
+    overlap = set(nontrade.values("datetime")).intersection(
+        trade_hist.values("exec_time")
+    )
+    if overlap:
+        raise ValueError("Statement table contains trade data: {}".format(overlap))
+
+
 def SplitCashBalance(statement: Table, trade_hist: Table) -> Tuple[Table, Table]:
     """Split the cash statement between simple cash effects vs. trades.
     Trades includes expirations and dividend events."""
 
     # Strategy has been inferred from the preparation and can be used to
     # distinguish trading and non-trading rows.
-    #
-
-    # TODO(blais): Use biselect() here.
-    nontrade = statement.select(lambda r: not r.strategy)
-    trade = statement.select(lambda r: bool(r.strategy))
+    trade, nontrade = statement.biselect(lambda r: bool(r.strategy))
 
     # Check that the non-trade cash statement transactions have no overlap
     # whatsoever with the trades on.
-    keyed_statement = nontrade.aggregate("datetime", list)
-    keyed_trades = trade_hist.aggregate("exec_time", list)
-
-    joined = petl.join(
-        keyed_statement,
-        keyed_trades,
-        lkey="datetime",
-        rkey="exec_time",
-        lprefix="cash",
-        rprefix="trade",
-    )
-
-    if joined.nrows() != 0:
-        raise ValueError("Statement table contains trade data: {}".format(joined))
+    _CheckNoTradeOverlap(nontrade, trade_hist)
 
     return trade, nontrade
 
@@ -109,23 +108,11 @@ def SplitFuturesStatements(futures: Table, trade_hist: Table) -> Tuple[Table, Ta
     # Splitting up the futures statement is trivial because the "Ref" columns is
     # present and consistently all trading data has a ref but not non-trading
     # data.
-    nontrade = futures.select(lambda r: not r.ref)
-    trade = futures.select(lambda r: bool(r.ref))
+    trade, nontrade = futures.biselect(lambda r: bool(r.ref))
 
     # Check that the non-trade cash statement transactions have no overlap
     # whatsoever with the trades on.
-    keyed_statement = nontrade.aggregate("datetime", list)
-    keyed_trades = trade_hist.aggregate("exec_time", list)
-    joined = petl.join(
-        keyed_statement,
-        keyed_trades,
-        lkey="datetime",
-        rkey="exec_time",
-        lprefix="cash",
-        rprefix="trade",
-    )
-    if joined.nrows() != 0:
-        raise ValueError("Statement table contains trade data: {}".format(joined))
+    _CheckNoTradeOverlap(nontrade, trade_hist)
 
     return trade, nontrade
 
@@ -169,6 +156,7 @@ def ReconcilePairsOrderIds(table: Table, threshold: int) -> Table:
 
 
 TREASURIES_REGEX = re.compile(r"912[0-9]{2}[0-9A-Z]{4}")
+_FULL_CALL_RE = re.compile(".* - FULL CALL$")
 
 
 def ProcessTradeHistory(
@@ -191,7 +179,9 @@ def ProcessTradeHistory(
     # history table by a unique key (using the time, seems to be pretty good)
     # and decimate it by matching rows from the cash tables. Then we verify that
     # the trade history has been fully accounted for by checking that it's empty.
-    trade_hist_map = trade_hist.recordlookup("exec_time")
+    trade_hist_map = collections.defaultdict(list)
+    for rec in trade_hist.records():
+        trade_hist_map[rec.exec_time].append(rec)
     trow_flds = trade_hist.fieldnames()
 
     # Process the equities cash table.
@@ -200,8 +190,11 @@ def ProcessTradeHistory(
         trades_table, other_table = cash_table.biselect(lambda r: r.type == "TRD")
         # print(other_table.lookallstr())
 
+        mapping = collections.defaultdict(list)
+        for rec in trades_table.records():
+            mapping[rec.datetime].append(rec)
+
         order_groups = []
-        mapping = trades_table.recordlookup("datetime")
         for dtime, cash_rows in mapping.items():
             # print(WrapRecords(cash_rows))
 
@@ -214,9 +207,7 @@ def ProcessTradeHistory(
 
             # Pull out callable actions that I didn't trigger and synthesize a
             # trade row; these will not show up in the trade history.
-            elif all(
-                re.match(".* - FULL CALL$", crow.description) for crow in cash_rows
-            ):
+            elif all(_FULL_CALL_RE.match(crow.description) for crow in cash_rows):
                 trade_rows = _SynthesizeTradeRowForCallable(cash_rows, trow_flds)
                 order_groups.append((dtime, cash_rows, trade_rows))
 
@@ -333,152 +324,120 @@ def _SynthesizeTradeRowForTreasury(crow: Record, trow_flds: List[str]) -> Record
     )
 
 
-def _CreateInstrument(r: Record) -> str:
-    """Create an instrument from the expiration data."""
-    return instrument.FromColumns(
-        r.underlying, r.expiration, r.expcode or None, r.putcall, r.strike, r.multiplier
-    )
+def GetOrderIdFromSymbol(symbol: str) -> str:
+    """Make up a unique order id for an expiration."""
+    return hashlib.blake2s(symbol.encode("ascii"), digest_size=4).hexdigest()
 
 
-def GetOrderIdFromSymbol(rec: Record) -> str:
-    """Make up a unique order id for an expiration."""
-    md5 = hashlib.blake2s(digest_size=4)
-    md5.update(rec.symbol.encode("ascii"))
-    return md5.hexdigest()
+_EXPIRATION_FIELDS = (
+    "datetime",
+    "order_id",
+    "rowtype",
+    "effect",
+    "instruction",
+    "symbol",
+    "instype",
+    "underlying",
+    "expiration",
+    "expcode",
+    "putcall",
+    "strike",
+    "multiplier",
+    "quantity",
+    "price",
+    "cash",
+    "commissions",
+    "fees",
+    "description",
+)
 
 
 def ProcessExpirationsToTransactions(cash_table: Table) -> Table:
     """Look at cash table and extract and normalize expirations from it."""
 
-    expirations, rest = cash_table.biselect(lambda r: r.type == "RAD")
-
-    expirations = (
-        expirations.addfield(
-            "valid_expi",
-            lambda r: Assert(
-                re.match(r"REMOVAL OF OPTION DUE TO EXPIRATION", r.description)
-            ),
-        )
-        .addfield("_x", _ParseExpirationDescriptionDetailed)
-        .convert("quantity", lambda _, r: r._x["quantity"], pass_row=True)
-        .rename("symbol", "symbol_in")
-        .addfields(
-            [
-                (name, lambda r, n=name: r._x.get(n))
-                for name in [
-                    "instype",
-                    "underlying",
-                    "expiration",
-                ]
-            ]
-        )
-        .addfield("expcode", "")
-        .addfields(
-            [
-                (name, lambda r, n=name: r._x.get(n))
-                for name in ["putcall", "strike", "multiplier", "instruction"]
-            ]
+    # Split out the expirations and parse each of their descriptions once to
+    # produce the final rows directly, in a single pass.
+    rows = [_EXPIRATION_FIELDS]
+    rest = [cash_table.header()]
+    for rec in cash_table.records():
+        if rec.type != "RAD":
+            rest.append(rec)
+            continue
+        Assert(rec.description.startswith("REMOVAL OF OPTION DUE TO EXPIRATION"))
+        x = _ParseExpirationDescriptionDetailed(rec)
+        symbol = _GetLegSymbol(
+            x["underlying"],
+            x["expiration"],
+            None,
+            x["putcall"],
+            None if x["strike"] is None else str(x["strike"]),
         )
-        .cutout("_x")
-        .addfield("symbol", lambda r: str(_CreateInstrument(r)))
-        # Fix up the remaining fields.
-        .addfield("order_id", GetOrderIdFromSymbol)
-        .addfield("effect", "CLOSING")
-        .addfield("rowtype", txnlib.Type.Expire)
-        .addfield("instype", None)
-        .addfield("commissions", ZERO)
-        .rename("commissions_fees", "fees")
-        .addfield("price", ZERO)
-        .addfield("cash", ZERO)
-        # Clean up for the final table.
-        .cut(
-            "datetime",
-            "order_id",
-            "rowtype",
-            "effect",
-            "instruction",
-            "symbol",
-            "instype",
-            "underlying",
-            "expiration",
-            "expcode",
-            "putcall",
-            "strike",
-            "multiplier",
-            "quantity",
-            "price",
-            "cash",
-            "commissions",
-            "fees",
-            "description",
+        rows.append(
+            (
+                rec.datetime,
+                GetOrderIdFromSymbol(symbol),
+                txnlib.Type.Expire,
+                "CLOSING",
+                x["instruction"],
+                symbol,
+                x["instype"],
+                x["underlying"],
+                x["expiration"],
+                "",
+                x["putcall"],
+                x["strike"],
+                x["multiplier"],
+                x["quantity"],
+                ZERO,
+                ZERO,
+                ZERO,
+                rec.commissions_fees,
+                rec.description,
+            )
         )
-    )
-    return expirations, rest
+    return petl.wrap(rows), petl.wrap(rest)
+
+
+_DIVIDEND_RE = re.compile(
+    r"(ORDINARY DIVIDEND|.*\bDISTRIBUTION|US TREASURY INTEREST\b)"
+)
+_DIVIDEND_SYMBOL_RE = re.compile(r"(?:DIVIDEND|DISTRIBUTION|US TREASURY INTEREST)~(.*)")
 
 
 def ProcessDividends(table: Table) -> Tuple[Table, Table]:
     """Check that the entire table contains only dividends."""
-    table = (
-        table.addfield(
-            "valid_div",
-            lambda r: Assert(
-                r.type == "DOI"
-                and re.match(
-                    r"(ORDINARY DIVIDEND|.*\bDISTRIBUTION|US TREASURY INTEREST\b)",
-                    r.description,
-                )
-            ),
-        )
-        .addfield("order_id", lambda r: r["rowid"])
-        .addfield("pair_id", lambda r: r["rowid"])
-        .capture(
-            "description",
-            r"(?:DIVIDEND|DISTRIBUTION|US TREASURY INTEREST)~(.*)",
-            ["symbol"],
-            include_original=True,
-        )
-        .addfield("underlying", lambda r: r["symbol"])
-        .addfield("rowtype", txnlib.Type.Cash)
-        .addfield("instruction", "")
-        .addfield("effect", "")
-        .addfield("instype", "Equity")
-        .addfield("expiration", None)
-        .addfield("expcode", None)
-        .addfield("putcall", None)
-        .addfield("strike", None)
-        .addfield("multiplier", ONE)
-        .cutout("quantity")
-        .addfield("quantity", ZERO)
-        .addfield("price", ZERO)
-        .rename("amount", "cash")
-        .addfield("commissions", ZERO)
-        .rename("misc_fees", "fees")
-        .cut(
-            [
-                "datetime",
-                "order_id",
-                "pair_id",
-                "rowtype",
-                "instruction",
-                "effect",
-                "symbol",
-                "instype",
-                "underlying",
-                "expiration",
-                "expcode",
-                "putcall",
-                "strike",
-                "multiplier",
-                "quantity",
-                "price",
-                "cash",
-                "commissions",
-                "fees",
-                "description",
-            ]
+    rows = [_TXN_FIELDS]
+    for rec in table.records():
+        Assert(rec.type == "DOI" and _DIVIDEND_RE.match(rec.description))
+        match = _DIVIDEND_SYMBOL_RE.search(rec.description)
+        if not match:
+            raise ValueError(f"No symbol in dividend description: {rec.description}")
+        symbol = match.group(1)
+        rows.append(
+            (
+                rec.datetime,
+                rec.rowid,
+                rec.rowid,
+                txnlib.Type.Cash,
+                "",
+                "",
+                symbol,
+                "Equity",
+                symbol,
+                None,
+                None,
+                None,
+                None,
+                ONE,
+                ZERO,
+                ZERO,
+                rec.amount,
+                ZERO,
+                rec.misc_fees,
+                rec.description,
+            )
         )
-    )
-    table = OffsetCouponTimes(table)
+    table = OffsetCouponTimes(petl.wrap(rows))
     return table, petl.empty()
 
 
@@ -506,20 +465,30 @@ Group = Tuple[datetime.date, List[Record], List[Record]]
 
 
 def PrintGroup(group: Group):
+    if not debug:
+        return
     dtime, cash_rows, trade_rows = group
     print("-" * 200)
     print(dtime)
-    ctable = petl.wrap(chain([cash_rows[0].flds], cash_rows))
+    ctable = petl.wrap([cash_rows[0].flds, *cash_rows])
     print(ctable.lookallstr())
-    ttable = petl.wrap(chain([trade_rows[0].flds], trade_rows))
+    ttable = petl.wrap([trade_rows[0].flds, *trade_rows])
     print(ttable.lookallstr())
 
 
+_MULTIPLIER_SPEC_RE = re.compile(r"\b1/(\d+)\b")
+_MULTIPLIER_SYMBOL_RE = re.compile(r"(?:\s|^)(/[A-Z0-9]*?)[FGHJKMNQUVXZ]2[0-9]\b")
+
+
+@lru_cache(maxsize=None)
 def FindMultiplierInDescription(string: str) -> Decimal:
     """Find a multiplier spec in the given description string."""
-    match = re.search(r"\b1/(\d+)\b", string)
+    # Note: The explicit multiplier spec takes precedence over the symbol, even
+    # if the symbol appears first in the string, so the two are searched for in
+    # order.
+    match = _MULTIPLIER_SPEC_RE.search(string)
     if not match:
-        match = re.search(r"(?:\s|^)(/[A-Z0-9]*?)[FGHJKMNQUVXZ]2[0-9]\b", string)
+        match = _MULTIPLIER_SYMBOL_RE.search(string)
         if not match:
             raise ValueError("No symbol to find multiplier: '{}'".format(string))
         symbol = match.group(1)
@@ -531,6 +500,29 @@ def FindMultiplierInDescription(string: str) -> Decimal:
     return Decimal(match.group(1))
 
 
+# Note: The same instruments recur over many legs, so their symbols are cached.
+# The strike is keyed by its string, as equal decimals may render differently,
+# and the multiplier is left out since it does not appear in the symbol.
+@lru_cache(maxsize=16384)
+def _GetLegSymbol(
+    underlying: str,
+    expiration: Optional[datetime.date],
+    expcode: Optional[str],
+    putcall: Optional[str],
+    strike: Optional[str],
+) -> str:
+    """Return the symbol of an instrument from its column values."""
+    inst = instrument.FromColumns(
+        underlying,
+        expiration,
+        expcode,
+        putcall,
+        None if strike is None else Decimal(strike),
+        ONE,
+    )
+    return str(inst)
+
+
 _TXN_FIELDS = (
     "datetime",
     "order_id",
@@ -574,18 +566,18 @@ def SplitGroupsToTransactions(groups: List[Group], is_futures: bool) -> Table:
 
         elif len(cash_rows) == len(trade_rows):
             # If we have an N:N situation, pair up the two groups by using quantity.
-            cash_rows_copy = list(cash_rows)
+            cash_rows_by_quantity = collections.defaultdict(collections.deque)
+            for crow in cash_rows:
+                cash_rows_by_quantity[crow.quantity].append(crow)
             for trow in trade_rows:
-                for index, crow in enumerate(cash_rows_copy):
-                    if crow.quantity == trow.quantity:
-                        break
-                else:
+                matching_rows = cash_rows_by_quantity.get(trow.quantity)
+                if not matching_rows:
                     raise ValueError(
                         "Could not find cash row matching the quantity of a trade row"
                     )
-                crow = cash_rows_copy.pop(index)
+                crow = matching_rows.popleft()
                 subgroups.append(([crow], [trow]))
-            if cash_rows_copy:
+            if any(cash_rows_by_quantity.values()):
                 raise ValueError("Internal error: residual row after matching.")
 
         else:
@@ -609,11 +601,18 @@ def SplitGroupsToTransactions(groups: List[Group], is_futures: bool) -> Table:
         for cash_rows, trade_rows in subgroups:
             # Pick up all the fees from the cash transactions.
             description = cash_rows[0].description
-            cash_commissions = sum(crow.commissions_fees for crow in cash_rows)
-            cash_fees = sum(crow.misc_fees for crow in cash_rows)
-
-            commissions = (cash_commissions / len(trade_rows)).quantize(Q3)
-            fees = (cash_fees / len(trade_rows)).quantize(Q3)
+            cash_commissions = sum((crow.commissions_fees for crow in cash_rows), ZERO)
+            cash_fees = sum((crow.misc_fees for crow in cash_rows), ZERO)
+
+            # Split the fees evenly across the legs. Most fees are zero, which
+            # doesn't require the division.
+            num_legs = Decimal(len(trade_rows))
+            commissions = (
+                (cash_commissions / num_legs).quantize(Q3)
+                if cash_commissions
+                else ZERO_Q3
+            )
+            fees = (cash_fees / num_legs).quantize(Q3) if cash_fees else ZERO_Q3
 
             for index, trow in enumerate(trade_rows, start=1):
                 row_desc = (
@@ -622,15 +621,13 @@ def SplitGroupsToTransactions(groups: List[Group], is_futures: bool) -> Table:
                     else description
                 )
 
-                inst = instrument.FromColumns(
+                symbol = _GetLegSymbol(
                     trow.underlying,
                     trow.expiration,
                     trow.expcode.lstrip("/") if trow.expcode else None,
                     trow.putcall,
-                    trow.strike,
-                    trow.multiplier,
+                    None if trow.strike is None else str(trow.strike),
                 )
-                symbol = str(inst)
 
                 if DO_COMMISSIONS_LAST_LEG:
                     # Include the commnissions on the last leg. This matches the
@@ -702,33 +699,39 @@ def CashBalance_Prepare(table: Table) -> Table:
         .addfield("datetime", partial(ParseDateTimePair, "date", "time"), index=1)
         .cutout("date", "time")
         # Convert numbers to Decimal instances.
-        .convert(
-            ("misc_fees", "commissions_fees", "amount", "balance"), number.ToDecimal
-        )
+        .convert(("misc_fees", "commissions_fees", "amount", "balance"), _ToDecimal)
         # Back out the "Misc Fees" field that is missing using consecutive
         # balances.
-        .addfieldusingcontext("misc_fees_inferred", _ComputeMiscFees)
-        .cutout("misc_fees")
-        .rename("misc_fees_inferred", "misc_fees")
+        .applyfn(_InferMiscFees)
     )
     return ParseDescription(table)
 
 
 def _CreateRowId(r: Record, fields: List[str]) -> str:
     """Create a unique row if from the given field values."""
-    md5 = hashlib.blake2s(digest_size=4)
-    for fname in fields:
-        value = getattr(r, fname)
-        md5.update(value.encode("utf8"))
-    return md5.hexdigest()
-
-
-def _ComputeMiscFees(prev: Record, rec: Record, _: Record) -> Decimal:
-    """Compute the Misc Fees backed from balance difference."""
-    if rec is None or prev is None:
-        return ZERO
-    diff_balance = rec.balance - prev.balance
-    return diff_balance - ((rec.amount or ZERO) + (rec.commissions_fees or ZERO))
+    # Note: Hashing the concatenated values produces the same digest as feeding
+    # them one by one, so the ids remain stable.
+    data = "".join(getattr(r, fname) for fname in fields).encode("utf8")
+    return hashlib.blake2s(data, digest_size=4).hexdigest()
+
+
+def _InferMiscFees(table: Table) -> Table:
+    """Replace the Misc Fees by those backed from balance differences.
+    The inferred column is moved to the end of the table."""
+    fieldnames = table.fieldnames()
+    kept = [i for i, name in enumerate(fieldnames) if name != "misc_fees"]
+    rows = [[fieldnames[i] for i in kept] + ["misc_fees"]]
+    prev = None
+    for rec in table.records():
+        if prev is None:
+            misc_fees = ZERO
+        else:
+            misc_fees = (rec.balance - prev.balance) - (
+                (rec.amount or ZERO) + (rec.commissions_fees or ZERO)
+            )
+        prev = rec
+        rows.append(tuple(rec[i] for i in kept) + (misc_fees,))
+    return petl.wrap(rows)
 
 
 def FuturesStatements_Prepare(table: Table) -> Table:
@@ -764,9 +767,7 @@ def FuturesStatements_Prepare(table: Table) -> Table:
         # Remove dashes from empty fields (making them truly empty).
         .convert(("ref", "misc_fees", "commissions_fees", "amount"), RemoveDashEmpty)
         # Convert numbers to Decimal or integer instances.
-        .convert(
-            ("misc_fees", "commissions_fees", "amount", "balance"), number.ToDecimal
-        )
+        .convert(("misc_fees", "commissions_fees", "amount", "balance"), _ToDecimal)
         .convert("ref", lambda v: int(v) if v else 0)
     )
     return ParseDescription(table)
@@ -777,70 +778,110 @@ def _ParseFuturesDate(string: str) -> datetime.date:
     if string == "*":
         return datetime.date.today()
     else:
-        return datetime.datetime.strptime(string, "%m/%d/%y").date()
+        return _ParseDate(string)
+
+
+@lru_cache(maxsize=4096)
+def _ParseDate(string: str) -> datetime.date:
+    return datetime.datetime.strptime(string, "%m/%d/%y").date()
 
 
 def ForexStatements_Prepare(table: Table) -> Table:
     return []
 
 
-def GetPutCall(rec: Record) -> str:
-    return (
-        ("PUT" if rec._instrument.putcall == "P" else "CALL")
-        if rec._instrument.strike
-        else None
-    )
+def GetPutCall(inst: instrument.Instrument) -> str:
+    return ("PUT" if inst.putcall == "P" else "CALL") if inst.strike else None
+
+
+# Trade history columns replaced by the instrument fields, or unnecessary.
+_TRADE_HISTORY_DROPPED = frozenset(
+    {"col0", "symbol", "exp", "strike", "type", "order_type", "net_price"}
+)
+
+
+def _ParseExecTime(string: str) -> Optional[datetime.datetime]:
+    return datetime.datetime.strptime(string, "%m/%d/%y %H:%M:%S") if string else None
+
+
+@lru_cache(maxsize=1)
+def _GetExpirationsLookup() -> Dict[str, Any]:
+    """Read the CME database for resolving expirations, once per process."""
+    db = mulmat.read_cme_database()
+    return mulmat.get_expirations_lookup(db)
 
 
 def AccountTradeHistory_Prepare(table: Table) -> Table:
     """Prepare the account trade history table."""
 
     # Read database for resolving expirations.
-    db = mulmat.read_cme_database()
-    db_lookup = mulmat.get_expirations_lookup(db)
-
-    table = (
-        table
-        # Remove empty columns.
-        .cutout("col0")
-        # Convert date/time fields to objects.
-        .convert(
-            "exec_time",
-            lambda string: (
-                datetime.datetime.strptime(string, "%m/%d/%y %H:%M:%S")
-                if string
-                else None
-            ),
+    db_lookup = _GetExpirationsLookup()
+
+    # The output retains the remaining input columns, followed by the inferred
+    # instrument type and the instrument fields.
+    fieldnames = tuple(table.header()) + ("instype",)
+    kept = [
+        i for i, name in enumerate(fieldnames) if name not in _TRADE_HISTORY_DROPPED
+    ]
+    header = [fieldnames[i] for i in kept] + [
+        "underlying",
+        "expiration",
+        "expcode",
+        "putcall",
+        "strike",
+        "multiplier",
+        "symbol",
+    ]
+
+    # Process all the rows in a single pass, filling down the time, spread and
+    # order id from the first leg of each order. The same instruments show up on
+    # many rows, so their fields are computed once per unique contract.
+    rows = [header]
+    instrument_columns = {}
+    exec_time, spread, order_id = None, None, None
+    for rec in table.records():
+        # Note: The key uses the original strike string, as it is preserved in
+        # the instrument.
+        key = (rec.symbol, rec.exp, rec.strike, rec.type)
+        exec_time = _ParseExecTime(rec.exec_time) or exec_time
+        spread = rec.spread or spread
+        order_id = rec.order_id or order_id
+        rec = Replace(
+            rec,
+            exec_time=exec_time,
+            spread=spread,
+            # Convert numbers to Decimal instances.
+            qty=_ToDecimal(rec.qty),
+            price=_ToDecimal(rec.price),
+            strike=_ToDecimal(rec.strike),
+            # Convert pos effect to single word naming.
+            pos_effect="OPENING" if rec.pos_effect == "TO OPEN" else "CLOSING",
+            # Convert order ids to integers (because they are).
+            order_id=int(order_id) if order_id else 0,
         )
-        # Fill in missing values.
-        .filldown("exec_time")
-        .convert(("spread", "order_id"), lambda v: v or None)
-        .filldown("spread", "order_id")
-        # Convert numbers to Decimal instances.
-        .convert(("qty", "price", "strike"), number.ToDecimal)
-        # Convert pos effect to single word naming.
-        .convert("pos_effect", lambda r: "OPENING" if r == "TO OPEN" else "CLOSING")
-        # Convert order ids to integers (because they are).
-        .convert("order_id", lambda v: int(v) if v else 0)
-        # Infer instrument type.
-        .addfield("instype", InferInstrumentType)
-        # Generate Beancount symbol from the row.
-        .addfield("_instrument", partial(symbols.ToInstrument, db_lookup))
-        # TODO(blais): Can we simply replace this antiquated code by instrument.Expand()?
-        .addfield("underlying", lambda r: r._instrument.underlying)
-        .addfield("expiration", lambda r: r._instrument.expiration)
-        .addfield("expcode", lambda r: r._instrument.expcode)
-        .addfield("putcall", GetPutCall)
-        .addfield("strike", lambda r: r._instrument.strike)
-        .addfield("multiplier", lambda r: Decimal(r._instrument.multiplier))
-        .cutout("symbol", "exp", "strike", "type")
-        .addfield("symbol", lambda r: str(r._instrument))
-        .cutout("_instrument")
-        # Remove unnecessary fields.
-        .cutout("order_type")
-        .cutout("net_price")
-    )
-    return table
+
+        # Infer instrument type and generate the instrument from the row.
+        instype = InferInstrumentType(rec)
+        rec = Record(tuple(rec) + (instype,), fieldnames)
+        key += (instype,)
+        try:
+            columns = instrument_columns[key]
+        except KeyError:
+            inst = symbols.ToInstrument(db_lookup, rec)
+            # TODO(blais): Can we simply replace this antiquated code by instrument.Expand()?
+            columns = instrument_columns[key] = (
+                inst.underlying,
+                inst.expiration,
+                inst.expcode,
+                GetPutCall(inst),
+                inst.strike,
+                Decimal(inst.multiplier),
+                str(inst),
+            )
+
+        rows.append(tuple(rec[i] for i in kept) + columns)
+
+    return petl.wrap(rows)
 
 
 def InferInstrumentType(rec: Record) -> str:
@@ -861,12 +902,15 @@ def InferInstrumentType(rec: Record) -> str:
     raise ValueError("Could not infer instrument type for {}".format(rec))
 
 
+# Note: Many rows share the same date and time, so the parsed values are cached.
+@lru_cache(maxsize=65536)
+def _ParseDateTime(date: str, time: str) -> datetime.datetime:
+    return datetime.datetime.strptime(f"{date} {time}", "%m/%d/%y %H:%M:%S")
+
+
 def ParseDateTimePair(date_field: str, time_field: str, rec: Record) -> datetime.date:
     """Parse a pair of date and time fields."""
-    return datetime.datetime.strptime(
-        "{} {}".format(getattr(rec, date_field), getattr(rec, time_field)),
-        "%m/%d/%y %H:%M:%S",
-    )
+    return _ParseDateTime(getattr(rec, date_field), getattr(rec, time_field))
 
 
 def RemoveDashEmpty(value: str) -> str:
@@ -877,46 +921,62 @@ def RemoveDashEmpty(value: str) -> str:
 # Inference from descriptions
 
 
+# Columns synthesized from the parsed descriptions.
+_DESCRIPTION_FIELDS = ("symbol", "strategy", "quantity", "rate", "maturity")
+
+
 def ParseDescription(table: Table) -> Table:
     """Parse description to synthesize the symbol for later, if present.
     This also adds missing entries.
     """
-    return (
-        table
+    rows = [tuple(table.fieldnames()) + _DESCRIPTION_FIELDS]
+    for rec in table.records():
         # Clean up uselesss prefixed from the descriptions.
-        .convert("description", CleanDescriptionPrefixes)
+        rec = Replace(rec, description=CleanDescriptionPrefixes(rec.description))
         # Parse the description string and insert new columns.
-        .addfield("_desc", _ParseDescriptionRecord)
-        .addfield("symbol", lambda r: r._desc.get("symbol", ""))
-        .addfield("strategy", lambda r: r._desc.get("strategy", ""))
-        .addfield("quantity", lambda r: r._desc.get("quantity", ""))
-        .addfield("rate", lambda r: r._desc.get("rate", ""))
-        .addfield("maturity", lambda r: r._desc.get("maturity", ""))
-        .cutout("_desc")
-    )
+        desc = _ParseDescriptionRecord(rec)
+        rows.append(
+            tuple(rec) + tuple(desc.get(name, "") for name in _DESCRIPTION_FIELDS)
+        )
+    return petl.wrap(rows)
 
 
 def _ParseDescriptionRecord(row: Record) -> Dict[str, Any]:
     """Parse the description field to a dict."""
-    if row.type == "TRD":
-        return _ParseTradeDescription(row.description)
-    if row.type == "RAD":
-        if row.description.startswith("REMOVAL OF OPTION"):
-            return _ParseExpirationDescription(row.description)
-    if row.type == "DOI":
-        if re.match(".* DIVIDEND", row.description):
-            return _ParseDividendDescription(row.description)
-        elif re.match(".* DISTRIBUTION", row.description):
-            return _ParseDistributionDescription(row.description)
-        elif re.match("US TREASURY INTEREST", row.description):
-            return _ParseTreasuryInterestDescription(row.description, row.amount)
+    parser = _DESCRIPTION_PARSERS.get(row.type)
+    return parser(row) if parser else {}
+
+
+def _ParseTradeRecord(row: Record) -> Dict[str, Any]:
+    return _ParseTradeDescription(row.description)
+
+
+def _ParseRemovalRecord(row: Record) -> Dict[str, Any]:
+    if row.description.startswith("REMOVAL OF OPTION"):
+        return _ParseExpirationDescription(row.description)
     return {}
 
 
-def _ParseTradeDescription(description: str) -> Dict[str, Any]:
-    """Parse the description field of a trade."""
+def _ParseIncomeRecord(row: Record) -> Dict[str, Any]:
+    description = row.description
+    if " DIVIDEND" in description:
+        return _ParseDividendDescription(description)
+    elif " DISTRIBUTION" in description:
+        return _ParseDistributionDescription(description)
+    elif description.startswith("US TREASURY INTEREST"):
+        return _ParseTreasuryInterestDescription(description, row.amount)
+    return {}
+
+
+_DESCRIPTION_PARSERS = {
+    "TRD": _ParseTradeRecord,
+    "RAD": _ParseRemovalRecord,
+    "DOI": _ParseIncomeRecord,
+}
+
 
-    regexp = "".join(
+_TRADE_HEAD_RE = re.compile(
+    "".join(
         [
             "(?P<web>TOSWeb )?",
             "(?P<type>MSO )?",
@@ -928,56 +988,72 @@ def _ParseTradeDescription(description: str) -> Dict[str, Any]:
             "$",
         ]
     )
-    match = re.match(regexp, description)
-    assert match, description
+)
+
+_UNDERLYING = "(?P<underlying>/?[A-Z0-9]+)(?::[A-Z]+)?"
+_UNDERLYING2 = "(?P<underlying2>/?[A-Z0-9]+)(?::[A-Z]+)?"
+_DETAILS = "(?P<details>.*)"
+
+# Standard Options strategies.
+# 'VERTICAL SPY 100 (Weeklys) 8 JAN 21 355/350 PUT'
+# 'IRON CONDOR NFLX 100 (Weeklys) 5 FEB 21 502.5/505/500/497.5 CALL/PUT'
+# 'CONDOR NDX 100 16 APR 21 [AM] 13500/13625/13875/13975 CALL"
+# 'BUTTERFLY GS 100 (Weeklys) 5 FEB 21 300/295/290 PUT'
+# 'VERT ROLL NDX 100 (Weeklys) 29 JAN 21/22 JAN 21 13250/13275/13250/13275 CALL'
+# 'DIAGONAL SPX 100 (Weeklys) 16 APR 21/16 APR 21 [AM] 3990/3995 CALL'
+# 'CALENDAR SPY 100 16 APR 21/19 MAR 21 386 PUT'
+# 'STRANGLE NVDA 100 (Weeklys) 1 APR 21 580/520 CALL/PUT'
+# 'COVERED LIT 100 16 APR 21 64 CALL/LIT'
+_TRADE_STANDARD_RE = re.compile(
+    f"(?P<strategy>"
+    f"COVERED|VERTICAL|BUTTERFLY|VERT ROLL|DIAGONAL|CALENDAR|STRANGLE"
+    f"|CONDOR|IRON CONDOR) {_UNDERLYING} {_DETAILS}"
+)
+
+# Custom options combos.
+# '2/2/1/1 ~IRON CONDOR RUT 100 16 APR 21 [AM] 2230/2250/2150/2055 CALL/PUT'
+# '-1 1/2 BACKRATIO /ZSU21:XCBT 1/50 SEP 21 /OZSU21:XCBT 1230/1340 CALL'
+# '1/-1/1/-1 CUSTOM SPX 100 (Weeklys) 16 APR 21/16 APR 21 [AM]/19 MAR 21/19 MAR 21 3990/3980/4000/4010 CALL/CALL/CALL/CALL'
+# '5/-4 CUSTOM SPX 100 16 APR 21 [AM]/16 APR 21 [AM] 3750/3695 PUT/PUT'
+_TRADE_CUSTOM_RE = re.compile(
+    rf"(?P<shape>-?\d+(?:/-?\d+)*) (?P<strategy>~IRON CONDOR|CUSTOM|BACKRATIO) "
+    f"{_UNDERLYING} {_DETAILS}"
+)
+
+# Futures calendars.
+_TRADE_FUT_CALENDAR_RE = re.compile(
+    f"(?P<strategy>FUT CALENDAR) {_UNDERLYING}-{_UNDERLYING2}"
+)
+
+# Single option.
+_TRADE_SINGLE_RE = re.compile(f"{_UNDERLYING} {_DETAILS}")
+
+# 'GAMR 100 16 APR 21 100 PUT'  (-> SINGLE)
+_TRADE_SINGLE_WITH_NUM_RE = re.compile(rf"{_UNDERLYING} \d+ {_DETAILS}")
+
+# Regular stock or future.
+# 'EWW'
+_TRADE_OUTRIGHT_RE = re.compile(_UNDERLYING)
+
+
+def _ParseTradeDescription(description: str) -> Dict[str, Any]:
+    """Parse the description field of a trade."""
+
+    match = _TRADE_HEAD_RE.match(description)
+    if match is None:
+        raise ValueError(f"Could not parse description: '{description}'")
     matches = match.groupdict()
     matches["side"] = "BUY" if matches["side"] == "BOT" else "SELL"
-    matches["quantity"] = abs(number.ToDecimal(matches["quantity"]))
+    matches["quantity"] = abs(_ToDecimal(matches["quantity"]))
     quantity = matches["quantity"]
     matches["price"] = (
-        number.ToDecimal(matches["price"].lstrip(" @")) if matches["price"] else ""
+        _ToDecimal(matches["price"].lstrip(" @")) if matches["price"] else ""
     )
     matches["venue"] = matches["venue"].lstrip() if matches["venue"] else ""
     rest = matches.pop("rest")
 
-    underlying = "(?P<underlying>/?[A-Z0-9]+)(?::[A-Z]+)?"
-    underlying2 = "(?P<underlying2>/?[A-Z0-9]+)(?::[A-Z]+)?"
-    details = "(?P<details>.*)"
-
-    # Standard Options strategies.
-    # 'VERTICAL SPY 100 (Weeklys) 8 JAN 21 355/350 PUT'
-    # 'IRON CONDOR NFLX 100 (Weeklys) 5 FEB 21 502.5/505/500/497.5 CALL/PUT'
-    # 'CONDOR NDX 100 16 APR 21 [AM] 13500/13625/13875/13975 CALL"
-    # 'BUTTERFLY GS 100 (Weeklys) 5 FEB 21 300/295/290 PUT'
-    # 'VERT ROLL NDX 100 (Weeklys) 29 JAN 21/22 JAN 21 13250/13275/13250/13275 CALL'
-    # 'DIAGONAL SPX 100 (Weeklys) 16 APR 21/16 APR 21 [AM] 3990/3995 CALL'
-    # 'CALENDAR SPY 100 16 APR 21/19 MAR 21 386 PUT'
-    # 'STRANGLE NVDA 100 (Weeklys) 1 APR 21 580/520 CALL/PUT'
-    # 'COVERED LIT 100 16 APR 21 64 CALL/LIT'
-    match = re.match(
-        f"(?P<strategy>"
-        f"COVERED|VERTICAL|BUTTERFLY|VERT ROLL|DIAGONAL|CALENDAR|STRANGLE"
-        f"|CONDOR|IRON CONDOR) {underlying} {details}",
-        rest,
-    )
-    if match:
-        sub = match.groupdict()
-        return {
-            "strategy": sub["strategy"],
-            "quantity": quantity,
-            "symbol": sub["underlying"],
-        }
-
-    # Custom options combos.
-    # '2/2/1/1 ~IRON CONDOR RUT 100 16 APR 21 [AM] 2230/2250/2150/2055 CALL/PUT'
-    # '-1 1/2 BACKRATIO /ZSU21:XCBT 1/50 SEP 21 /OZSU21:XCBT 1230/1340 CALL'
-    # '1/-1/1/-1 CUSTOM SPX 100 (Weeklys) 16 APR 21/16 APR 21 [AM]/19 MAR 21/19 MAR 21 3990/3980/4000/4010 CALL/CALL/CALL/CALL'
-    # '5/-4 CUSTOM SPX 100 16 APR 21 [AM]/16 APR 21 [AM] 3750/3695 PUT/PUT'
-    match = re.match(
-        rf"(?P<shape>-?\d+(?:/-?\d+)*) (?P<strategy>~IRON CONDOR|CUSTOM|BACKRATIO) "
-        f"{underlying} {details}",
-        rest,
-    )
+    # Options strategies, standard and custom.
+    match = _TRADE_STANDARD_RE.match(rest) or _TRADE_CUSTOM_RE.match(rest)
     if match:
         sub = match.groupdict()
         return {
@@ -987,7 +1063,7 @@ def _ParseTradeDescription(description: str) -> Dict[str, Any]:
         }
 
     # Futures calendars.
-    match = re.match(f"(?P<strategy>FUT CALENDAR) {underlying}-{underlying2}", rest)
+    match = _TRADE_FUT_CALENDAR_RE.match(rest)
     if match:
         sub = match.groupdict()
         # Note: Return the front month instrument as the underlying.
@@ -998,13 +1074,12 @@ def _ParseTradeDescription(description: str) -> Dict[str, Any]:
         }
 
     # Single option.
-    match = re.match(f"{underlying} {details}", rest)
+    match = _TRADE_SINGLE_RE.match(rest)
     if match:
         sub = match.groupdict()
         return {"strategy": "SINGLE", "quantity": quantity, "symbol": sub["underlying"]}
 
-    # 'GAMR 100 16 APR 21 100 PUT'  (-> SINGLE)
-    match = re.match(rf"{underlying} \d+ {details}", rest)
+    match = _TRADE_SINGLE_WITH_NUM_RE.match(rest)
     if match:
         sub = match.groupdict()
         return {
@@ -1013,9 +1088,7 @@ def _ParseTradeDescription(description: str) -> Dict[str, Any]:
             "symbol": sub["underlying"],
         }
 
-    # Regular stock or future.
-    # 'EWW'
-    match = re.fullmatch(f"{underlying}", rest)
+    match = _TRADE_OUTRIGHT_RE.fullmatch(rest)
     if match:
         sub = match.groupdict()
         return {
@@ -1028,21 +1101,33 @@ def _ParseTradeDescription(description: str) -> Dict[str, Any]:
     raise ValueError(message)
 
 
+_ORDINARY_DIVIDEND_RE = re.compile(
+    "ORDINARY (?P<strategy>DIVIDEND)~(?P<symbol>[A-Z0-9]+)"
+)
+_DISTRIBUTION_RE = re.compile(".* (?P<strategy>DISTRIBUTION)~(?P<symbol>[A-Z0-9]+)")
+_TREASURY_INTEREST_RE = re.compile(
+    r"(?P<strategy>US TREASURY INTEREST)~(?P<instrument>"
+    r"(?P<name>.*) (?P<rate>\d*\.\d+)% (?P<maturity>\d\d/\d\d/\d\d\d\d))"
+)
+
+
 def _ParseDividendDescription(description: str) -> Dict[str, Any]:
     """Parse the description field of an expiration."""
-    mo = re.match("ORDINARY (?P<strategy>DIVIDEND)~(?P<symbol>[A-Z0-9]+)", description)
-    assert mo, description
+    mo = _ORDINARY_DIVIDEND_RE.match(description)
+    if mo is None:
+        raise ValueError(f"Could not parse description: '{description}'")
     matches = mo.groupdict()
-    matches["quantity"] = Decimal("0")
+    matches["quantity"] = ZERO
     return matches
 
 
 def _ParseDistributionDescription(description: str) -> Dict[str, Any]:
     """Parse the description field of an expiration."""
-    mo = re.match(".* (?P<strategy>DISTRIBUTION)~(?P<symbol>[A-Z0-9]+)", description)
-    assert mo, description
+    mo = _DISTRIBUTION_RE.match(description)
+    if mo is None:
+        raise ValueError(f"Could not parse description: '{description}'")
     matches = mo.groupdict()
-    matches["quantity"] = Decimal("0")
+    matches["quantity"] = ZERO
     return matches
 
 
@@ -1057,14 +1142,11 @@ def _ParseTreasuryInterestDescription(
     # - Computing the quantity and matching against positions, which we do here.
     # - Joining against a table we download from the tdameritrade website.
 
-    mo = re.fullmatch(
-        r"(?P<strategy>US TREASURY INTEREST)~(?P<instrument>"
-        r"(?P<name>.*) (?P<rate>\d*\.\d+)% (?P<maturity>\d\d/\d\d/\d\d\d\d))",
-        description,
-    )
-    assert mo, description
+    mo = _TREASURY_INTEREST_RE.fullmatch(description)
+    if mo is None:
+        raise ValueError(f"Could not parse description: '{description}'")
     matches = mo.groupdict()
-    rate = matches["rate"] = Decimal(matches["rate"])
+    rate = matches["rate"] = _Decimal(matches["rate"])
     matches["symbol"] = matches["instrument"]
     matches["maturity"] = dt.datetime.strptime(matches["maturity"], "%m/%d/%Y").date()
     # Back out the quantity from the known amount and rate.
@@ -1072,9 +1154,8 @@ def _ParseTreasuryInterestDescription(
     return matches
 
 
-def _ParseExpirationDescription(description: str) -> Dict[str, Any]:
-    """Parse the description field of an expiration."""
-    regexp = "".join(
+_EXPIRATION_RE = re.compile(
+    "".join(
         [
             "REMOVAL OF OPTION DUE TO EXPIRATION ",
             "(?P<quantity>[+-]?[0-9.]+) ",
@@ -1083,61 +1164,69 @@ def _ParseExpirationDescription(description: str) -> Dict[str, Any]:
             r"(?P<suffix>\(.*\) )?",
             r"(?P<expiration>\d+ [A-Z]{3} \d+) ",
             "(?P<strike>[0-9.]+) ",
-            "(?P<side>PUT|CALL)",
+            "(?P<putcall>PUT|CALL)",
         ]
     )
-    match = re.match(regexp, description)
-    assert match, description
-    matches = match.groupdict()
-    matches["expiration"] = parser.parse(matches["expiration"]).date()
-    matches["strike"] = Decimal(matches["strike"])
-    matches["multiplier"] = Decimal(matches["multiplier"])
-    matches["quantity"] = Decimal(matches["quantity"])
+)
+
+
+def _ParseExpirationDescription(description: str) -> Dict[str, Any]:
+    """Parse the description field of an expiration."""
+    match = _EXPIRATION_RE.match(description)
+    if match is None:
+        raise ValueError(f"Could not parse description: '{description}'")
+    # Note: Only the underlying is needed here; the other fields are parsed from
+    # the detailed version when the expirations are processed.
     return {
         "strategy": "EXPIRATION",
-        "quantity": Decimal("0"),
-        "symbol": matches["underlying"],
+        "quantity": ZERO,
+        "symbol": match.group("underlying"),
     }
 
 
+# Note: Expirations cluster on a few dates, so the parsed values are cached.
+@lru_cache(maxsize=1024)
+def _ParseExpirationDate(string: str) -> datetime.date:
+    """Parse an expiration date, e.g. '8 JAN 21'."""
+    try:
+        return datetime.datetime.strptime(string, "%d %b %y").date()
+    except ValueError:
+        return parser.parse(string).date()
+
+
 # A second version of this that provides all the required detail for any
 # instrument.
 def _ParseExpirationDescriptionDetailed(rec: Record) -> Dict[str, Any]:
     """Parse the description field of an expiration."""
-    regexp = "".join(
-        [
-            "REMOVAL OF OPTION DUE TO EXPIRATION ",
-            "(?P<quantity>[+-]?[0-9.]+) ",
-            "(?P<underlying>[A-Z/:]+) ",
-            r"(?P<multiplier>\d+) ",
-            r"(?P<suffix>\(.*\) )?",
-            r"(?P<expiration>\d+ [A-Z]{3} \d+) ",
-            "(?P<strike>[0-9.]+) ",
-            "(?P<putcall>PUT|CALL)",
-        ]
-    )
-    match = re.match(regexp, rec.description)
-    assert match, description
+    match = _EXPIRATION_RE.match(rec.description)
+    if match is None:
+        raise ValueError(f"Could not parse description: '{rec.description}'")
     matches = match.groupdict()
 
     underlying = matches["underlying"]
     matches["instype"] = (
         "Future Option" if underlying.startswith("/") else "Equity Option"
     )
-    matches["expiration"] = parser.parse(matches["expiration"]).date()
-    matches["strike"] = Decimal(matches["strike"])
-    matches["multiplier"] = Decimal(matches["multiplier"])
+    matches["expiration"] = _ParseExpirationDate(matches["expiration"])
+    matches["strike"] = _Decimal(matches["strike"])
+    matches["multiplier"] = _Decimal(matches["multiplier"])
 
     # Note that the TOS cash transaction has the benefit of containing the
     # signed quantity.
-    signed_quantity = Decimal(matches["quantity"])
+    signed_quantity = _Decimal(matches["quantity"])
     matches["quantity"] = abs(signed_quantity)
     matches["instruction"] = "SELL" if signed_quantity < ZERO else "BUY"
     return matches
 
 
+_DESCRIPTION_PREFIXES_RE = re.compile("(WEB:(AA_[A-Z]+|WEB_GRID_SNAP)|tAndroid) ")
+
+
 def CleanDescriptionPrefixes(string: str) -> str:
-    return re.sub("(WEB:(AA_[A-Z]+|WEB_GRID_SNAP)|tAndroid) ", "", string)
+    # Most descriptions have no prefix to remove; check for one cheaply first.
+    if "WEB:" not in string and "tAndroid " not in string:
+        return string
+    return _DESCRIPTION_PREFIXES_RE.sub("", string)
 
 
 def ReplaceTreasuryInterestSymbols(
@@ -1221,8 +1310,7 @@ def GetTransactions(filename: str, treasuries_table: Table) -> Tuple[Table, Tabl
         if rest.nrows() != 0:
             raise ValueError(f"Remaining unprocessed transactions: {rest}")
 
-    # Concatenate the tables.
-    fieldnames = equities_txns.columns()
+    # Concatenate the tables, grouping the rows by order, in time order.
     txns = petl.cat(
         equities_txns,
         equities_expi,
@@ -1230,33 +1318,44 @@ def GetTransactions(filename: str, treasuries_table: Table) -> Tuple[Table, Tabl
         futures_txns,
         futures_expi,
         futures_divs,
-    ).sort("datetime")
-
-    # Add a cost column, calculated from the data.
-    # Note that for futures contracts this includes the notional value.
-    def CalculateCost(r: Record) -> Decimal:
-        sign = -1 if r.instruction == "BUY" else +1
-        return sign * r.quantity * r.multiplier * r.price
-
-    # Add some more missing columns.
-    txns = (
-        txns.sort("order_id")
-        # Add the account number to the table.
-        .addfield("account", utils.GetAccountNumber(filename), index=0)
-        # Make up a transaction id. It's a real bummer that the one that's
-        # available in the API does not show up anywhere in this file.
-        .addfieldusingcontext("order_sequence", OrderSequence)
-        .addfield("transaction_id", GetTransactionId)
-        .cutout("order_sequence")
-        # Convert the order ids to match those from the API.
-        .convert("order_id", lambda oid: "T{}".format(oid) if oid else oid)
-        # Add a cost row.
-        .addfield("cost", CalculateCost)
-        .addfield("init", None)
-    )
-
-    # Make the final ordering correct and finalize the columns.
-    txns = txns.cut(txnlib.FIELDS)
+    ).sort(["order_id", "datetime"])
+
+    # Add some more missing columns and finalize the columns, in a single pass
+    # over each run of rows from the same order.
+    account = utils.GetAccountNumber(filename)
+    rows = [txnlib.FIELDS]
+    for order_id, order_rows in itertools.groupby(
+        txns.records(), key=lambda r: r.order_id
+    ):
+        order_rows = list(order_rows)
+        for sequence, r in enumerate(order_rows, start=1):
+            rows.append(
+                (
+                    account,
+                    # Make up a transaction id. It's a real bummer that the one
+                    # that's available in the API does not show up anywhere in
+                    # this file.
+                    GetTransactionId(
+                        order_id, sequence if len(order_rows) > 1 else None
+                    ),
+                    r.datetime,
+                    r.rowtype,
+                    # Convert the order ids to match those from the API.
+                    "T{}".format(order_id) if order_id else order_id,
+                    r.symbol,
+                    r.effect,
+                    r.instruction,
+                    r.quantity,
+                    r.price,
+                    CalculateCost(r),
+                    r.cash,
+                    r.commissions,
+                    r.fees,
+                    r.description,
+                    None,
+                )
+            )
+    txns = petl.wrap(rows)
 
     nontrade = petl.cat(
         cashbal_nontrade.addfield("subaccount", "Cash"),
@@ -1266,28 +1365,24 @@ def GetTransactions(filename: str, treasuries_table: Table) -> Tuple[Table, Tabl
     return txns, nontrade
 
 
-def OrderSequence(prv: Optional[int], cur: Optional[int], nxt: Optional[int]) -> int:
-    """Return a sequence number for order ids."""
-    if (prv is not None and cur.order_id == prv.order_id) or (
-        nxt is not None and cur.order_id == nxt.order_id
-    ):
-        if prv is None or prv.order_sequence is None or prv.order_id != cur.order_id:
-            sequence = 1
-        else:
-            sequence = prv.order_sequence + 1
-        return sequence
-    else:
-        return None
+# Sign of the cost by instruction; anything but a buy is positive.
+_COST_SIGNS = {"BUY": -ONE}
+
 
+def CalculateCost(r: Record) -> Decimal:
+    """Calculate the cost of a transaction from the data.
+    Note that for futures contracts this includes the notional value."""
+    return _COST_SIGNS.get(r.instruction, ONE) * r.quantity * r.multiplier * r.price
 
-def GetTransactionId(rec: Record) -> str:
+
+def GetTransactionId(order_id: Any, order_sequence: Optional[int]) -> str:
     """Make up a unique transaction id."""
     # We use the order id + sequence, if not unique.
-    if rec.order_sequence is None:
-        return str(rec.order_id)
+    if order_sequence is None:
+        return str(order_id)
     else:
-        assert rec.order_id, rec
-        return "{}.{}".format(rec.order_id, rec.order_sequence)
+        assert order_id, order_id
+        return "{}.{}".format(order_id, order_sequence)
 
 
 def PrepareTables(filename: str) -> Dict[str, Table]:
@@ -1311,10 +1406,11 @@ def PrepareTables(filename: str) -> Dict[str, Table]:
 
     # Read the CSV file.
     prepared_tables = {}
-    with open(filename, encoding="utf8") as infile:
-        # Iterate through the sections.
-        sections = csv_utils.csv_split_sections_with_titles(csv.reader(infile))
-        for section_name, rows in sections.items():
+    with open(filename, encoding="utf8", newline="") as infile:
+        # Iterate through the sections as they are read, so that the unused
+        # ones can be dropped right away.
+        sections = csv_utils.csv_iter_sections_with_titles(csv.reader(infile))
+        for section_name, rows in sections:
             handler = handlers.get(section_name, None)
             if not handler:
                 continue
@@ -1339,21 +1435,44 @@ def ImportTreasuries(config: config_pb2.Config) -> petl.Table:
     return treasuries.ImportTreasuries(treasuries_filename)
 
 
-def ImportTransactions(config: config_pb2.Config) -> petl.Table:
-    treasuries_table = ImportTreasuries(config)
+def ImportStatement(config: config_pb2.Config, filename: str) -> Tuple[Table, Table]:
+    """Read the transactions and non-trades from an account statement file.
+
+    Both the transactions and non-trades importers read the same files, so the
+    results are cached for as long as the files are left unchanged.
+    """
+    treasuries_filename = path.expandvars(
+        config.ameritrade_download_transactions_for_treasuries
+    )
+    return _ImportStatement(
+        filename,
+        path.getmtime(filename),
+        treasuries_filename,
+        path.getmtime(treasuries_filename),
+    )
+
 
+@lru_cache(maxsize=8)
+def _ImportStatement(
+    filename: str, mtime: float, treasuries_filename: str, treasuries_mtime: float
+) -> Tuple[Table, Table]:
+    treasuries_table = treasuries.ImportTreasuries(treasuries_filename)
+    return GetTransactions(filename, treasuries_table)
+
+
+def ImportTransactions(config: config_pb2.Config) -> petl.Table:
     # Proper import of the transactions for every year.
     pattern = path.expandvars(config.thinkorswim_account_statement_csv_file_pattern)
     fnmap = discovery.GetLatestFilePerYear(pattern)
     transactions_list = []
     for year, filename in sorted(fnmap.items()):
         try:
-            transactions, _ = GetTransactions(filename, treasuries_table)
-        except AssertionError:
+            transactions, _ = ImportStatement(config, filename)
+        except (AssertionError, ValueError):
             logging.error("Error while processing file '%s'", filename)
             raise
         transactions_list.append(
-            transactions.select(lambda r, y=year: r.datetime.year == y)
+            transactions.select("datetime", lambda v, y=year: v.year == y)
         )
 
     return petl.cat(*transactions_list)
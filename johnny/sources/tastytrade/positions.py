@@ -71,6 +71,24 @@ def GetIndexPrice(r: Record) -> Decimal:
     return ZERO
 
 
+def NormalizeSymbols(table: Table) -> Table:
+    """Normalize the instrument type and symbol of a raw positions table.
+    This is shared between the full positions import and the prices reader."""
+    return (
+        table
+        # Make instrument type match that from the transactiosn log.
+        .convert("Type", _INSTYPES.__getitem__)
+        .rename("Type", "instype")
+        # Parse symbol and add instrument fields.
+        .addfield(
+            "symbol",
+            lambda r: str(symbols.ParseSymbol(r["Symbol"], r["instype"])),
+            index=2,
+        )
+        .cutout("Symbol")
+    )
+
+
 def GetPositions(filename: str) -> Table:
     """Process the filename, normalize, and produce tables."""
     if not filename:
@@ -82,18 +100,9 @@ def GetPositions(filename: str) -> Table:
         # Clean up account name to match that from the transactions log.
         .convert("Account", NormalizeAccountName)
         .rename("Account", "account")
-        # Make instrument type match that from the transactiosn log.
-        .convert("Type", _INSTYPES.__getitem__)
-        .rename("Type", "instype")
-        # Parse symbol and add instrument fields.
-        .addfield(
-            "instrument", lambda r: symbols.ParseSymbol(r["Symbol"], r["instype"])
-        )
-        .cutout("Symbol")
-        .addfield("symbol", lambda r: str(r.instrument), index=2)
+        .applyfn(NormalizeSymbols)
         # TODO(blais): Cross-check these fields against the symbol, just to be sure.
         .cutout("Exp Date", "DTE", "Strike Price", "Call/Put")
-        .cutout("instrument")
         # Convert fields to Decimal values.
         .convert(
             [
@@ -152,11 +161,7 @@ def ReadPricesFromPositionsFile(filename: str) -> Mapping[str, Decimal]:
         return {}
     return (
         petl.fromcsv(filename)
-        .convert("Type", _INSTYPES.__getitem__)
-        .rename("Type", "instype")
-        .addfield(
-            "symbol", lambda r: str(symbols.ParseSymbol(r["Symbol"], r["instype"]))
-        )
+        .applyfn(NormalizeSymbols)
         .rename("Mark", "mark")
         .convert("mark", ToDecimal)
         .cut("symbol", "mark")
@@ -7,7 +7,7 @@ import petl
 import dateutil.parser
 
 from johnny.base import instrument
-from johnny.base.etl import Table
+from johnny.base.etl import Record, Table
 from johnny.base.number import ToDecimal
 from johnny.base import taxes
 
@@ -39,13 +39,7 @@ def read_worksheet(filename: str) -> Table:
                 "long_term_gain_loss": "lt_gain_loss",
             }
         )
-        .addfield(
-            "symbol",
-            lambda r: _parse_security_description(
-                r.security_description, r.underlying_symbol, r.opening_transaction
-            ),
-            index=0,
-        )
+        .addfield("symbol", _get_symbol, index=0)
         .applyfn(instrument.Expand, "symbol", "instype")
         .movefield("instype", 1)
     )
@@ -71,13 +65,7 @@ def read_form8949(filename: str) -> Table:
             ToDecimal,
         )
         .rename({"8949_box": "box", "gain_loss_adj": "gain_adj"})
-        .addfield(
-            "symbol",
-            lambda r: _parse_security_description(
-                r.security_description, r.underlying_symbol, r.opening_transaction
-            ),
-            index=0,
-        )
+        .addfield("symbol", _get_symbol, index=0)
         .applyfn(instrument.Expand, "symbol", "instype")
         .movefield("instype", 1)
         .convert("box", str.strip)
@@ -87,19 +75,28 @@ def read_form8949(filename: str) -> Table:
     return form8949
 
 
-def _parse_security_description(description: str, und: str, txntype: str) -> str:
-    if txntype in {"BTO", "STO", "XCH", "MRG"}:
-        match = re.match(
-            r"(PUT|CALL)\s+([A-Z0-9]+)\s+(\d\d/\d\d/\d\d)\s+([0-9.]+)", description
-        )
-        if match:
-            putcall, und, expiration, strike = match.groups()
-            expiration = dateutil.parser.parse(expiration).date()
-            strike = ToDecimal(strike.rstrip("0") if "." in strike else strike)
-            return f"{und}_{expiration:%y%m%d}_{putcall[0]}{strike}"
-        raise ValueError(f"Could not parse option '{description}'")
+# Opening transaction types whose security description describes an option.
+_OPTION_TXNTYPES = frozenset({"BTO", "STO", "XCH", "MRG"})
+
+_OPTION_DESC_RE = re.compile(r"(PUT|CALL)\s+([A-Z0-9]+)\s+(\d\d/\d\d/\d\d)\s+([0-9.]+)")
 
-    return und.lstrip("*")
+
+def _get_symbol(r: Record) -> str:
+    """Compute the symbol of a row, only parsing the description for options."""
+    if r.opening_transaction in _OPTION_TXNTYPES:
+        return _parse_security_description(r.security_description)
+    return r.underlying_symbol.lstrip("*")
+
+
+def _parse_security_description(description: str) -> str:
+    """Parse the description of an option security to a symbol."""
+    match = _OPTION_DESC_RE.match(description)
+    if not match:
+        raise ValueError(f"Could not parse option '{description}'")
+    putcall, und, expiration, strike = match.groups()
+    expiration = dateutil.parser.parse(expiration).date()
+    strike = ToDecimal(strike.rstrip("0") if "." in strike else strike)
+    return f"{und}_{expiration:%y%m%d}_{putcall[0]}{strike}"
 
 
 # TODO(blais): Non-equity options aren't categorized as such by Tastytrade as of
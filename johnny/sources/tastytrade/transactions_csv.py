@@ -10,11 +10,12 @@ __copyright__ = "Copyright (C) 2021  Martin Blais"
 __license__ = "GNU GPLv2"
 
 import collections
+import concurrent.futures
 import decimal
 import functools
 from decimal import Decimal
 from os import path
-from typing import Any, Dict, List, Optional, Tuple, Mapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Mapping
 import datetime
 import hashlib
 import logging
@@ -28,8 +29,9 @@ from dateutil import parser
 from johnny.base.config import Account
 from johnny.base import config as configlib
 from johnny.base import discovery
+from johnny.base import etl
 from johnny.base import transactions as txnlib
-from johnny.base.etl import petl, Table, Record, WrapRecords
+from johnny.base.etl import petl, Table, Record, Replace, WrapRecords
 from johnny.base.number import ToDecimal
 from johnny.sources.tastytrade import symbols
 
@@ -38,164 +40,205 @@ ZERO = Decimal(0)
 ONE = Decimal(1)
 
 
-def GetSequence(sequence_dict: Mapping[str, int], rec: Record) -> int:
-    """Make up a unique sequence id for orders."""
-    sequence_dict[rec.order_id] += 1
-    return sequence_dict[rec.order_id]
-
-
-def GetTransactionId(rec: Record) -> int:
-    if rec.order_id is None:
-        h = hashlib.blake2s(digest_size=6)
+# A single pattern classifying the description of "Receive Deliver" rows. The
+# name of the group that matched selects the row type; the alternatives are
+# tried in order, like a ladder of individual matches would.
+_RECEIVE_DELIVER_RE = re.compile(
+    r"(?P<expire>Removal of .* due to (?:expiration|exercise|assignment))"
+    r"|(?P<trade>(?:Buy|Sell) to|Symbol change|Bought.*Awarded .* Long)"
+    r"|(?P<dividend>Special dividend: (?:Open|Close))"
+    r"|(?P<adjustment>.* cost basis adjustment)"
+)
+
+# Patterns used to infer the price from the description.
+_PRICE_RE = re.compile(r"@ ([0-9.]+)($| - .*)")
+_INFER_PRICE_RE = re.compile(r"Symbol change|Special dividend")
+
+_FILENAME_RE = re.compile(
+    r"tastytrade_transactions_(.*)_(\d{4}-\d{2}-\d{2})_(\d{4}-\d{2}-\d{2})\.csv"
+)
+
+
+def GetTransactionId(
+    sequence_dict: Mapping[str, int],
+    order_id: Optional[str],
+    date: str,
+    symbol: str,
+    description: str,
+) -> str:
+    """Make up a unique transaction id. Rows with an order id are numbered in
+    sequence within their order, in input order."""
+    if order_id is None:
         # Note: For FutureOption we need the symbol name because they don't
-        # insert the underlying's description in there.
-        h.update(rec["Date"].encode("ascii"))
-        h.update(rec["Symbol"].encode("ascii"))
-        h.update(rec["Description"].encode("ascii"))
-        return "^{}".format(h.hexdigest())
+        # insert the underlying's description in there. Hashing the
+        # concatenation in one call produces the same digest as updating the
+        # hash with each field in turn, so the ids remain stable.
+        data = "".join((date, symbol, description))
+        return "^{}".format(
+            hashlib.blake2s(data.encode("ascii"), digest_size=6).hexdigest()
+        )
     else:
-        assert rec.sequence
-        return "^{}.{}".format(rec.order_id, rec.sequence)
+        sequence_dict[order_id] += 1
+        return "^{}.{}".format(order_id, sequence_dict[order_id])
+
+
+# Decimal conversion of the numerical columns. The same few strings (zero fees,
+# quantities of one, standard multipliers) come up on most rows, so the
+# conversions are cached.
+_ToDecimal = functools.lru_cache(maxsize=4096)(ToDecimal)
+
+# Symbol parsing. The fills of the same contract repeat the same symbol, and
+# the parsed instruments are immutable, so they are cached as well.
+_ParseSymbol = functools.lru_cache(maxsize=4096)(symbols.ParseSymbol)
+
+
+@functools.lru_cache(maxsize=4096)
+def ParseDateTime(string: str) -> datetime.datetime:
+    """Parse the date into a naive datetime. All the rows of an order share the
+    same date string, so the results are cached."""
+    # The exports use ISO 8601 with a UTC offset, e.g. '2021-05-03T10:00:00-0400',
+    # which the C parser handles directly. Fall back on the general parser for
+    # any other format.
+    try:
+        return datetime.datetime.fromisoformat(string).replace(tzinfo=None)
+    except ValueError:
+        return parser.parse(string).replace(tzinfo=None)
 
 
-def GetRowType(rowtype: str, rec: Record) -> str:
+def GetRowType(rowtype: str, description: str) -> str:
     """Validate the row type."""
     if rowtype == "Trade":
         return txnlib.Type.Trade
     elif rowtype == "Receive Deliver":
-        if re.match(
-            r"Removal of .* due to (expiration|exercise|assignment)", rec.Description
-        ):
+        match = _RECEIVE_DELIVER_RE.match(description)
+        kind = match.lastgroup if match else None
+        if kind == "expire":
             return txnlib.Type.Expire
-        elif re.match(r"(Buy|Sell) to", rec.Description):
+        elif kind == "trade":
             return txnlib.Type.Trade
-        elif re.match(r"Symbol change", rec.Description):
-            return txnlib.Type.Trade
-        elif re.match(r"Bought.*Awarded .* Long", rec.Description):
-            return txnlib.Type.Trade
-        elif re.match(r"Special dividend: (Open|Close)", rec.Description):
+        elif kind == "dividend":
             raise NotImplementedError("This should probably be a dividend type. "
                                       "Fix this.")
             return txnlib.Type.Trade
-        elif re.match(r".* cost basis adjustment", rec.Description):
+        elif kind == "adjustment":
             raise NotImplementedError("This should be an attributed adjustment, "
                                       "like a dividend.")
             return "Other"
     return KeyError(
-        "Invalid rowtype '{}'; description: '{}'".format(rowtype, rec.Description)
+        "Invalid rowtype '{}'; description: '{}'".format(rowtype, description)
     )
 
 
-def GetOrderId(value: str, rec: Record) -> str:
+def GetOrderId(value: str, date: str) -> str:
     """Get the order id, or create one where necessary."""
     # If the row is a name change, we convert that to a trade that links
     # together the in and out legs with a uniquely generated order id. The time
     # appears to be unique, and we use that as a hash for the id.
     if not value:
-        h = hashlib.blake2s(digest_size=3)
-        h.update(rec["Date"].encode("ascii"))
-        return "nam{}".format(h.hexdigest())
+        digest = hashlib.blake2s(date.encode("ascii"), digest_size=3)
+        return "nam{}".format(digest.hexdigest())
     else:
         # Normal case.
         return value or None
 
 
-def GetPrice(rec: Record) -> Decimal:
+def GetPrice(
+    rowtype: str,
+    description: str,
+    instype: str,
+    value: Decimal,
+    quantity: Decimal,
+    multiplier: Decimal,
+) -> Decimal:
     """Get the per-contract price."""
 
     # If this is an expiration, the price is always zero.
-    if rec.rowtype == txnlib.Type.Expire:
+    if rowtype == txnlib.Type.Expire:
         return ZERO
 
     # Try to find the price from the description. Note that this isn't always
     # possible.
-    match = re.search(r"@ ([0-9.]+)($| - .*)", rec.Description)
+    match = _PRICE_RE.search(description)
     if match:
         return Decimal(match.group(1))
 
     # Where there isn't any price in the description, infer it from the other
     # numerical fields.
-    if re.match(r"Symbol change|Special dividend", rec.Description):
-        assert rec.instype == "EquityOption"
+    if _INFER_PRICE_RE.match(description):
+        assert instype == "EquityOption"
         # Note: This will work for the equity option case.
-        return abs(rec.Value) / (rec.Quantity * rec.Multiplier)
+        return abs(value) / (quantity * multiplier)
 
-    raise ValueError("Could not infer price from description: {}".format(rec))
+    raise ValueError("Could not infer price from description: {}".format(description))
 
 
-def GetMultiplier(rec: Record) -> Decimal:
+def GetMultiplier(
+    instrument: symbols.Instrument, instype: str, average_price: Decimal, price: Decimal
+) -> Decimal:
     """Get the underlying contract multiplier."""
 
     # Use the multiplier from the instrument.
-    multiplier = rec.instrument.multiplier
+    multiplier = instrument.multiplier
 
     # Check the multiplier for stocks (which is normally unset).
-    if rec["instype"] == "Equity":
+    if instype == "Equity":
         assert multiplier == 1
 
     # Sanity check: Verify that the approximate multiplier you can compute using
     # the (rounded) average price is close to the one we infer from our futures
-    # library. This is a cross-check for the futures library code.
-    if rec["instype"] != "Future" and rec["Average Price"] != ZERO:
-        approx_multiplier = abs(rec["Average Price"]) / rec.price
-        valid_multiplier = 0.99 < (multiplier / approx_multiplier) < 1.01
-        if not valid_multiplier:
-            raise AssertionError(
-                "Invalid multiplier check: {} {} ({} / {})".format(
-                    multiplier, approx_multiplier, rec["Average Price"], rec.price
+    # library. This is a cross-check for the futures library code, and only runs
+    # when assertions are enabled.
+    if etl.ASSERT:
+        if instype != "Future" and average_price != ZERO:
+            approx_multiplier = abs(average_price) / price
+            # Equivalent to 0.99 < multiplier / approx_multiplier < 1.01.
+            if abs(multiplier - approx_multiplier) * 100 >= approx_multiplier:
+                raise AssertionError(
+                    "Invalid multiplier check: {} {} ({} / {})".format(
+                        multiplier, approx_multiplier, average_price, price
+                    )
                 )
-            )
-    assert isinstance(multiplier, Decimal), "Invalid type for {}: {}".format(
-        multiplier, type(multiplier)
-    )
+        assert isinstance(multiplier, Decimal), "Invalid type for {}: {}".format(
+            multiplier, type(multiplier)
+        )
     return multiplier
 
 
-def GetExpiration(expi_str: str) -> Optional[datetime.date]:
-    """Get the contract expiration date."""
-    return datetime.datetime.strptime(expi_str, "%m/%d/%y").date() if expi_str else None
+def ValidateStrike(strike: Decimal, instrument: symbols.Instrument):
+    """Validate the strike price against the one from the symbol."""
+    if strike:
+        assert instrument.strike == strike, (instrument.strike, strike)
 
 
-def GetStrike(rec: Record) -> Optional[Decimal]:
-    """Process, clean up and validate the strike price."""
-    strike = rec["Strike Price"]
-    if strike:
-        assert rec.instrument.strike == strike, (rec.instrument.strike, strike)
-        return strike
-    return None
-
-
-def GetInstruction(rec: Record) -> Optional[str]:
-    """Get instruction."""
-    if rec.Action.startswith("BUY"):
-        return "BUY"
-    elif rec.Action.startswith("SELL"):
-        return "SELL"
-    elif rec.rowtype == txnlib.Type.Expire:
-        # The signs aren't set. We're going to use this value temporarily, and
-        # once the stream is done, we compute and map the signs {e80fcd889943}.
-        return ""
-    else:
-        raise NotImplementedError("Unknown instruction: '{}'".format(rec.Action))
+# Instruction and position effect for each value of the 'Action' field.
+_ACTIONS = {
+    "BUY_TO_OPEN": ("BUY", "OPENING"),
+    "BUY_TO_CLOSE": ("BUY", "CLOSING"),
+    "SELL_TO_OPEN": ("SELL", "OPENING"),
+    "SELL_TO_CLOSE": ("SELL", "CLOSING"),
+    "BUY": ("BUY", ""),
+    "SELL": ("SELL", ""),
+}
 
 
-def GetPosEffect(rec: Record) -> Optional[str]:
-    """Get position effect."""
-    if rec.Action.endswith("TO_OPEN"):
-        return "OPENING"
-    elif rec.Action.endswith("TO_CLOSE"):
-        return "CLOSING"
-    elif rec.rowtype == txnlib.Type.Expire:
-        return "CLOSING"
-    else:
-        return ""
+def GetInstructionEffect(action: str, rowtype: str) -> Tuple[str, str]:
+    """Split the 'Action' field into instruction and position effect."""
+    try:
+        return _ACTIONS[action]
+    except KeyError:
+        if rowtype == txnlib.Type.Expire:
+            # The signs aren't set. We're going to use this value temporarily,
+            # and once the stream is done, we compute and map the signs
+            # {e80fcd889943}.
+            return "", "CLOSING"
+        raise NotImplementedError("Unknown instruction: '{}'".format(action))
 
 
 def ParseStrikePrice(string: str) -> Decimal:
     """Parse and normalize the strike price."""
-    cstring = re.sub(r"(.*)\.0$", r"\1", string)
+    cstring = string[:-2] if string.endswith(".0") else string
     if not cstring:
-        return Decimal(0)
+        return ZERO
     try:
         return Decimal(cstring)
     except decimal.InvalidOperation:
@@ -211,149 +254,162 @@ _INSTYPES = {
 }
 
 
-def GetFuturesCost(rec: Record) -> Decimal:
+def GetFuturesCost(
+    instype: str,
+    instruction: str,
+    quantity: Decimal,
+    multiplier: Decimal,
+    price: Decimal,
+    value: Decimal,
+) -> Decimal:
     """Override the cost if the field is a Future instrument."""
-    if rec.instype == "Future":
-        sign = -1 if rec.instruction == "BUY" else 1
-        return sign * rec.quantity * rec.multiplier * rec.price
+    if instype == "Future":
+        sign = -1 if instruction == "BUY" else 1
+        return sign * quantity * multiplier * price
     else:
-        return rec.Value
+        return value
 
 
 def DeduplicateExpirations(table: Table) -> Table:
     """Sum expiration messages by symbol."""
 
-    expiration_txns = {}  # symbol -> txn-id
-    expiration_quantities = {}  # symbol -> quantity
+    records = list(table.records())
+    expirations = collections.defaultdict(list)  # symbol -> [(txn-id, quantity)]
+    for rec in records:
+        if rec.rowtype == txnlib.Type.Expire:
+            expirations[rec.symbol].append((rec.transaction_id, rec.quantity))
+
+    # Keep the first expiration of each symbol with the total quantity.
+    quantities = {}  # txn-id -> quantity
     remove_transactions = set()  # txn-id
-    for rec in table.records():
+    for txns in expirations.values():
+        quantities[txns[0][0]] = sum(quantity for _, quantity in txns)
+        remove_transactions.update(transaction_id for transaction_id, _ in txns[1:])
+
+    # Rewrite the kept expirations and drop the others in a single pass; the
+    # other rows are passed through untouched.
+    rows = [table.header()]
+    for rec in records:
         if rec.rowtype == txnlib.Type.Expire:
-            if rec.symbol not in expiration_txns:
-                expiration_txns[rec.symbol] = rec.transaction_id
-                expiration_quantities[rec.symbol] = rec.quantity
-            else:
-                remove_transactions.add(rec.transaction_id)
-                expiration_quantities[rec.symbol] += rec.quantity
+            if rec.transaction_id in remove_transactions:
+                continue
+            rec = Replace(rec, quantity=quantities[rec.transaction_id])
+        rows.append(rec)
+    return petl.wrap(rows)
+
+
+def NormalizeRow(
+    account: str, sequence_dict: Mapping[str, int], rec: Record
+) -> Iterator[Tuple]:
+    """Normalize a row of the input table to a transaction, in a single pass.
+    This produces no output for the rows that are ignored."""
+
+    # Bind the string fields used more than once.
+    date = rec["Date"]
+    symbol = rec["Symbol"]
+    description = rec["Description"]
+
+    # Normalize the type. Ignore dividends for now. TODO(blais): Implement
+    # those. This is done first, so that the ignored rows don't pay for the
+    # conversions below.
+    rowtype = GetRowType(rec["Type"], description)
+    if rowtype == txnlib.Type.Cash:
+        return
+
+    # Convert fields to Decimal values.
+    value = _ToDecimal(rec["Value"])
+    # Warning: Don't use 'Average Price' for anything serious, it is a value
+    # rounded to dollar, not a precise value to the instrument's actual
+    # precision.
+    average_price = _ToDecimal(rec["Average Price"])
+    quantity = _ToDecimal(rec["Quantity"])
+    # Note: The original multiplier column only represents the multiplier of
+    # the average price and is innacurate. We want the multiplier of the
+    # quantity, which we infer below.
+    avgprice_multiplier = _ToDecimal(rec["Multiplier"])
+    commissions = _ToDecimal(rec["Commissions"])
+    fees = _ToDecimal(rec["Fees"])
+    strike = ParseStrikePrice(rec["Strike Price"])
+
+    # Normalize the instrument type and parse the instrument from the original
+    # row.
+    instype = _INSTYPES[rec["Instrument Type"]]
+    instrument = _ParseSymbol(symbol, instype)
+
+    # Parse the date into datetime.
+    dtime = ParseDateTime(date)
+
+    # Infer the per-contract price and multiplier.
+    price = GetPrice(
+        rowtype, description, instype, value, quantity, avgprice_multiplier
+    )
+    multiplier = GetMultiplier(instrument, instype, average_price, price)
 
-    quantities = {
-        transaction_id: expiration_quantities[symbol]
-        for symbol, transaction_id in expiration_txns.items()
-    }
+    # Process, clean up and validate the strike price.
+    ValidateStrike(strike, instrument)
 
-    def convert_expiration_quantity(quantity: Decimal, rec: Record) -> Decimal:
-        return quantities.get(rec.transaction_id, rec.quantity)
+    # Convert order id and create a sequenced order id that's unique (for
+    # transaction ids).
+    order_id = GetOrderId(rec["Order #"], date)
+    transaction_id = GetTransactionId(
+        sequence_dict, order_id, date, symbol, description
+    )
 
-    return table.convert(
-        "quantity", convert_expiration_quantity, pass_row=True
-    ).selectnotin("transaction_id", remove_transactions)
+    # Split 'Action' field.
+    instruction, effect = GetInstructionEffect(rec["Action"], rowtype)
+
+    # Set cost field to notional value for futures (for easy running P/L
+    # calculations).
+    cost = GetFuturesCost(instype, instruction, quantity, multiplier, price, value)
+
+    # See transactions.md.
+    yield (
+        account,
+        transaction_id,
+        dtime,
+        rowtype,
+        order_id,
+        str(instrument),
+        effect,
+        instruction,
+        quantity,
+        price,
+        cost,
+        ZERO,
+        commissions,
+        fees,
+        description,
+        None,
+    )
 
 
 def NormalizeTrades(table: petl.Table, account: str) -> petl.Table:
     """Prepare the table for processing."""
 
-    table = (
-        table
-        # Convert fields to Decimal values.
-        .convert(
-            [
-                "Value",
-                # Warning: Don't use 'Average Price' for anything
-                # serious, it is a value rounded to dollar, not a precise
-                # value to the instrument's actual precision.
-                "Average Price",
-                "Quantity",
-                "Multiplier",
-                "Commissions",
-                "Fees",
-            ],
-            ToDecimal,
-        )
-        .convert("Strike Price", ParseStrikePrice)
-        # Normalize the instrument type.
-        .rename("Instrument Type", "instype")
-        .convert("instype", _INSTYPES.__getitem__)
-        # Parse the instrument from the original row.
-        .addfield(
-            "instrument", lambda r: symbols.ParseSymbol(r["Symbol"], r["instype"])
-        )
-        .addfield("symbol", lambda r: str(r.instrument))
-        # Add underlying with the normalized futures contract month code.
-        .addfield("underlying", lambda r: r.instrument.underlying)
-        # Add the account id.
-        .addfield("account", account)
-        # Normalize the type.
-        .rename("Type", "rowtype")
-        .convert("rowtype", GetRowType, pass_row=True)
-        # Ignore dividends for now. TODO(blais): Implement those.
-        .selectnotin("rowtype", {txnlib.Type.Cash})
-        # Parse the date into datetime.
-        .addfield("datetime", lambda r: parser.parse(r.Date).replace(tzinfo=None))
-        # Convert the futures expiration date.
-        .convert("Expiration Date", GetExpiration)
-        .rename("Expiration Date", "expiration")
-        # Infer the per-contract price.
-        .addfield("price", GetPrice)
-        # Infer the per-contract multiplier.
-        .addfield("multiplier", GetMultiplier)
-        # We remove the original multiplier column because it only
-        # represents the multiplier of the average price and is innacurate.
-        # We want the multiplier of the quantity.
-        .cutout("Multiplier")
-        # Process, clean up and validate the strike price.
-        .addfield("strike", GetStrike)
-        .cutout("Strike Price")
-        # Add expiration code.
-        .addfield("expcode", lambda r: r.instrument.expcode)
-        # Convert order id and create a sequenced order id that's unique
-        # (for transaction ids).
-        .rename("Order #", "order_id")
-        .convert("order_id", GetOrderId, pass_row=True)
-        .addfield(
-            "sequence", functools.partial(GetSequence, collections.defaultdict(int))
-        )
-        .addfield("transaction_id", GetTransactionId)
-        # Rename some of the columns to be passed through.
-        .rename("Description", "description")
-        .rename("Call or Put", "putcall")
-        .rename("Quantity", "quantity")
-        .rename("Commissions", "commissions")
-        .rename("Fees", "fees")
-        # Split 'Action' field.
-        .addfield("instruction", GetInstruction)
-        .addfield("effect", GetPosEffect)
-        # Set cost field to notional value for futures (for easy running
-        # P/L calculations).
-        .addfield("cost", GetFuturesCost)
-        .cutout("Value")
-        # Remove instrument we parsed early on.
-        .cutout("instrument")
-        # Removed remaining unnecessary columns.
-        .cutout("Symbol")
-        .cutout("Underlying Symbol")
-        .cutout("Average Price")
-        .cutout("Action")
-        # See transactions.md.
-        .cut(txnlib.FIELDS)
-        # Ensure the state updated in GetSequence occurs exactly only once.
-        .cache()
-    )
+    # Materialize the normalized rows once. This ensures the sequence state
+    # updated in GetTransactionId is only ever updated once per row.
+    sequence_dict = collections.defaultdict(int)
+    rows = [
+        row
+        for rec in table.records()
+        for row in NormalizeRow(account, sequence_dict, rec)
+    ]
+    table = petl.wrap([txnlib.FIELDS] + rows)
 
     # Deduplicate expiration messages, summing up the quantities.
     table = DeduplicateExpirations(table)
 
     # Note: The sign of the expirations isn't provided by the input file. It
     # gets inferred here.
-    return (
-        table
-        # In case of opening/closing pairs occurring over assignment and
-        # exercise at the same time (expiration), we want to make sure the
-        # opening and closing occur in the correct order for inventory
-        # matching.
-        .addfield("effect_key", lambda r: 0 if r.effect == "OPENING" else 1)
-        .sort(["datetime", "order_id", "effect_key"])
-        .cutout("effect_key")
-        .addfield("init", None)
+    #
+    # In case of opening/closing pairs occurring over assignment and exercise
+    # at the same time (expiration), we want to make sure the opening and
+    # closing occur in the correct order for inventory matching.
+    records = sorted(
+        table.records(),
+        key=lambda r: (r.datetime, r.order_id, 0 if r.effect == "OPENING" else 1),
     )
+    return petl.wrap([table.header()] + records)
 
 
 def SplitTables(table: Table) -> Tuple[Table, Table]:
@@ -363,10 +419,7 @@ def SplitTables(table: Table) -> Tuple[Table, Table]:
 
 def GetAccount(filename: str) -> str:
     """Get the account id."""
-    match = re.match(
-        r"tastytrade_transactions_(.*)_" r"(\d{4}-\d{2}-\d{2})_(\d{4}-\d{2}-\d{2}).csv",
-        path.basename(filename),
-    )
+    match = _FILENAME_RE.match(path.basename(filename))
     if not match:
         logging.warning(
             "Could not figure out the account name from the "
@@ -386,12 +439,30 @@ def GetTransactions(filename: str) -> Tuple[Table, Table]:
     return norm_trades_table, other_table
 
 
+def _GetTransactionsRows(filename: str) -> Tuple[List[Tuple], List[Tuple]]:
+    """Process a file and materialize its tables to plain picklable rows."""
+    trades_table, other_table = GetTransactions(filename)
+    return list(map(tuple, trades_table)), list(map(tuple, other_table))
+
+
+def GetTransactionsMany(filenames: List[str]) -> List[Tuple[Table, Table]]:
+    """Process multiple files in parallel, returning the tables of each file.
+    The files are independent, so each is processed in its own process."""
+    if len(filenames) <= 1:
+        # Starting a process and pickling the results costs more than the
+        # parse of a single file.
+        return [GetTransactions(filename) for filename in filenames]
+    with concurrent.futures.ProcessPoolExecutor() as executor:
+        results = list(executor.map(_GetTransactionsRows, filenames))
+    return [(petl.wrap(trades), petl.wrap(other)) for trades, other in results]
+
+
 @click.command()
-@click.argument("filename", type=click.Path(resolve_path=True, exists=True))
-def main(filename: str):
+@click.argument("filenames", nargs=-1, type=click.Path(resolve_path=True, exists=True))
+def main(filenames: List[str]):
     """Simple local runner for this translator."""
-    trades_table, _ = GetTransactions(filename)
-    print(trades_table.lookallstr())
+    for trades_table, _ in GetTransactionsMany(filenames):
+        print(trades_table.lookallstr())
 
 
 if __name__ == "__main__":
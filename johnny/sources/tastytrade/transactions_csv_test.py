@@ -0,0 +1,159 @@
+__copyright__ = "Copyright (C) 2021  Martin Blais"
+__license__ = "GNU GPLv2"
+
+from decimal import Decimal
+import datetime
+import textwrap
+import unittest
+
+from johnny.base import transactions as txnlib
+from johnny.base.etl import petl
+from johnny.sources.tastytrade import transactions_csv
+
+
+_TRANSACTIONS_CSV = textwrap.dedent(
+    """\
+    Date,Type,Action,Symbol,Instrument Type,Description,Value,Quantity,Average Price,Commissions,Fees,Multiplier,Underlying Symbol,Expiration Date,Strike Price,Call or Put,Order #
+    2021-03-01T10:00:00-0500,Trade,SELL_TO_OPEN,TLRY  210416P00020000,Equity Option,Sold 1 TLRY 04/16/21 Put 20.00 @ 1.50,150.00,1,150.00,-1.00,-0.14,100,TLRY,4/16/21,20,PUT,1001
+    2021-04-16T16:00:00-0400,Receive Deliver,,TLRY  210416P00020000,Equity Option,Removal of option due to expiration,0.00,1,0.00,0.00,0.00,100,TLRY,4/16/21,20,PUT,
+    2021-04-16T16:00:00-0400,Receive Deliver,,TLRY  210416P00020000,Equity Option,Removal of option due to expiration,0.00,2,0.00,0.00,0.00,100,TLRY,4/16/21,20,PUT,
+    2021-05-03T09:30:00-0400,Receive Deliver,SELL_TO_CLOSE,ABC   210521C00010000,Equity Option,Symbol change: Close 1.0 ABC 05/21/21 Call 10.00,250.00,1,250.00,0.00,0.00,100,ABC,5/21/21,10,CALL,
+    2021-05-03T09:30:00-0400,Receive Deliver,BUY_TO_OPEN,XYZ   210521C00010000,Equity Option,Symbol change: Open 1.0 XYZ 05/21/21 Call 10.00,-250.00,1,-250.00,0.00,0.00,100,XYZ,5/21/21,10,CALL,
+    2021-06-01T11:00:00-0400,Trade,SELL_TO_CLOSE,SPY   210618C00420000,Equity Option,Sold 1 SPY 06/18/21 Call 420.00 @ 2.00,200.00,1,200.00,-1.00,-0.14,100,SPY,6/18/21,420,CALL,2002
+    2021-06-01T11:00:00-0400,Trade,BUY_TO_OPEN,SPY   210716C00430000,Equity Option,Bought 1 SPY 07/16/21 Call 430.00 @ 1.25,-125.00,1,-125.00,-1.00,-0.14,100,SPY,7/16/21,430,CALL,2002
+    """
+)
+
+
+class TestNormalizeTrades(unittest.TestCase):
+    def setUp(self):
+        table = petl.fromcsv(petl.MemorySource(_TRANSACTIONS_CSV.encode("utf8")))
+        normalized = transactions_csv.NormalizeTrades(table, "x1234")
+        self.assertEqual(tuple(txnlib.FIELDS), normalized.header())
+        self.rows = list(normalized.data())
+
+    def test_trade(self):
+        self.assertEqual(
+            (
+                "x1234",
+                "^1001.1",
+                datetime.datetime(2021, 3, 1, 10, 0),
+                txnlib.Type.Trade,
+                "1001",
+                "TLRY_210416_P20",
+                "OPENING",
+                "SELL",
+                Decimal("1"),
+                Decimal("1.50"),
+                Decimal("150.00"),
+                Decimal("0"),
+                Decimal("-1.00"),
+                Decimal("-0.14"),
+                "Sold 1 TLRY 04/16/21 Put 20.00 @ 1.50",
+                None,
+            ),
+            self.rows[0],
+        )
+
+    def test_split_expiration(self):
+        # The expiration is split over two rows, which are summed into the first.
+        expirations = [r for r in self.rows if r[3] == txnlib.Type.Expire]
+        self.assertEqual(
+            [
+                (
+                    "x1234",
+                    "^namac7b79.1",
+                    datetime.datetime(2021, 4, 16, 16, 0),
+                    txnlib.Type.Expire,
+                    "namac7b79",
+                    "TLRY_210416_P20",
+                    "CLOSING",
+                    "",
+                    Decimal("3"),
+                    Decimal("0"),
+                    Decimal("0.00"),
+                    Decimal("0"),
+                    Decimal("0.00"),
+                    Decimal("0.00"),
+                    "Removal of option due to expiration",
+                    None,
+                )
+            ],
+            expirations,
+        )
+
+    def test_name_change(self):
+        # The legs of a name change have no order id; one is made up from the
+        # date, shared by both legs. The opening leg is sorted first.
+        self.assertEqual(
+            [
+                (
+                    "x1234",
+                    "^nam373e0a.2",
+                    datetime.datetime(2021, 5, 3, 9, 30),
+                    txnlib.Type.Trade,
+                    "nam373e0a",
+                    "XYZ_210521_C10",
+                    "OPENING",
+                    "BUY",
+                    Decimal("1"),
+                    Decimal("2.50"),
+                    Decimal("-250.00"),
+                    Decimal("0"),
+                    Decimal("0.00"),
+                    Decimal("0.00"),
+                    "Symbol change: Open 1.0 XYZ 05/21/21 Call 10.00",
+                    None,
+                ),
+                (
+                    "x1234",
+                    "^nam373e0a.1",
+                    datetime.datetime(2021, 5, 3, 9, 30),
+                    txnlib.Type.Trade,
+                    "nam373e0a",
+                    "ABC_210521_C10",
+                    "CLOSING",
+                    "SELL",
+                    Decimal("1"),
+                    Decimal("2.50"),
+                    Decimal("250.00"),
+                    Decimal("0"),
+                    Decimal("0.00"),
+                    Decimal("0.00"),
+                    "Symbol change: Close 1.0 ABC 05/21/21 Call 10.00",
+                    None,
+                ),
+            ],
+            self.rows[2:4],
+        )
+
+    def test_opening_sorted_before_closing(self):
+        # A roll at a single timestamp, input with the closing leg first.
+        self.assertEqual(
+            [
+                (
+                    "^2002.2",
+                    datetime.datetime(2021, 6, 1, 11, 0),
+                    "SPY_210716_C430",
+                    "OPENING",
+                    "BUY",
+                    Decimal("1.25"),
+                    Decimal("-125.00"),
+                ),
+                (
+                    "^2002.1",
+                    datetime.datetime(2021, 6, 1, 11, 0),
+                    "SPY_210618_C420",
+                    "CLOSING",
+                    "SELL",
+                    Decimal("2.00"),
+                    Decimal("200.00"),
+                ),
+            ],
+            [(r[1], r[2], r[5], r[6], r[7], r[9], r[10]) for r in self.rows[4:]],
+        )
+        self.assertEqual(6, len(self.rows))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -112,7 +112,17 @@ def csv_split_sections(rows):
     Returns:
       A list of sections, which are lists of rows, which are lists of strings.
     """
-    sections = []
+    return list(csv_iter_sections(rows))
+
+
+def csv_iter_sections(rows):
+    """Given rows, split them in at empty lines, one section at a time.
+
+    Args:
+      rows: An iterable of rows, which are themselves lists of strings.
+    Yields:
+      Sections, which are lists of rows, which are lists of strings.
+    """
     current_section = []
     for row in rows:
         if any(cell.strip() for cell in row):
@@ -120,11 +130,10 @@ def csv_split_sections(rows):
             current_section.append(row)
         else:
             # Row is empty, end section.
-            sections.append(current_section)
+            yield current_section
             current_section = []
     if current_section:
-        sections.append(current_section)
-    return sections
+        yield current_section
 
 
 def csv_split_sections_with_titles(rows):
@@ -140,8 +149,19 @@ def csv_split_sections_with_titles(rows):
     Returns:
       A list of lists of rows (list-of-strings).
     """
-    sections_map = {}
-    for index, section in enumerate(csv_split_sections(rows)):
+    return dict(csv_iter_sections_with_titles(rows))
+
+
+def csv_iter_sections_with_titles(rows):
+    """Given rows, split their sections and their titles, one section at a time.
+    See csv_split_sections_with_titles() for details.
+
+    Args:
+      rows: An iterable of rows (list-of-strings).
+    Yields:
+      Pairs of section name and list of rows (list-of-strings).
+    """
+    for index, section in enumerate(csv_iter_sections(rows)):
         # Skip too short sections, cannot possibly be a title.
         if len(section) < 2:
             continue
@@ -150,8 +170,7 @@ def csv_split_sections_with_titles(rows):
             section = section[1:]
         else:
             name = "Section {}".format(index)
-        sections_map[name] = section
-    return sections_map
+        yield name, section
 
 
 def iter_sections(fileobj, separating_predicate=None):
@@ -197,6 +197,29 @@ class TestCSVUtils(unittest.TestCase):
         sections = csv_utils.csv_split_sections_with_titles(rows)
         self.assertEqual({}, sections)
 
+    def test_csv_iter_sections_with_titles(self):
+        rows = csv_utils.as_rows(
+            """\
+        Names:
+        First Name, Last Name
+        Caroline, Chang
+
+
+        Last Name, Age
+        Blais, 41
+        """
+        )
+        sections = csv_utils.csv_iter_sections_with_titles(iter(rows))
+        self.assertEqual(
+            ("Names:", [["First Name", " Last Name"], ["Caroline", " Chang"]]),
+            next(sections),
+        )
+        self.assertEqual(
+            ("Section 2", [["Last Name", " Age"], ["Blais", " 41"]]),
+            next(sections),
+        )
+        self.assertEqual([], list(sections))
+
 
 def linearize(iterator, joiner=list):
     """Consume a section iterator.
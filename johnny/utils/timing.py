@@ -19,8 +19,7 @@ def create_logger(logger: Optional[logging.Logger]):
         return lambda operation_name: contextlib.nullcontext()
 
 
-@contextlib.contextmanager
-def log_time(operation_name, log_timings, indent=0):
+class log_time:
     """A context manager that times the block and logs it to info level.
 
     Args:
@@ -30,15 +29,33 @@ def log_time(operation_name, log_timings, indent=0):
       indent: An integer, the indentation level for the format of the timing
         line. This is useful if you're logging timing to a hierarchy of
         operations.
-    Yields:
-      The start time of the operation.
+    Returns (from __enter__):
+      The perf_counter start time. Note that this is a performance counter
+      value with an arbitrary origin, not an epoch timestamp.
+
+    Nothing is logged if the block raises an exception.
     """
-    time1 = time.time()
-    yield time1
-    time2 = time.time()
-    if log_timings:
-        log_timings(
-            "Operation: {:48} Time: {}{:6.0f} ms".format(
-                "'{}'".format(operation_name), "      " * indent, (time2 - time1) * 1000
+
+    # Note: This is a plain class rather than a generator-based context manager
+    # to keep the overhead low on short blocks.
+    __slots__ = ("operation_name", "log_timings", "indent", "time1")
+
+    def __init__(self, operation_name, log_timings, indent=0):
+        self.operation_name = operation_name
+        self.log_timings = log_timings
+        self.indent = indent
+
+    def __enter__(self):
+        self.time1 = time.perf_counter()
+        return self.time1
+
+    def __exit__(self, *exc_info):
+        time2 = time.perf_counter()
+        if self.log_timings and exc_info[0] is None:
+            self.log_timings(
+                "Operation: {:48} Time: {}{:6.0f} ms".format(
+                    f"'{self.operation_name}'",
+                    "      " * self.indent,
+                    (time2 - self.time1) * 1000,
+                )
             )
-        )
@@ -8,33 +8,28 @@ __license__ = "GNU GPLv2"
 from decimal import Decimal
 from functools import partial
 from os import path
-from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Mapping, NamedTuple, Optional, Tuple
 import io
 import datetime
+import collections
+import concurrent.futures
+import contextlib
 import functools
 import itertools
 import os
-import re
+import queue
 import threading
 import logging
-import tempfile
 
 import dateutil.parser
 import numpy as np
 import networkx as nx
-import seaborn as sns
 
 try:
     from johnny.exports import beanjohn
 except ImportError:
     beanjohn = None
 
-sns.set()
-from matplotlib import pyplot
-import matplotlib
-
-matplotlib.use("Agg")
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
 from more_itertools import first
 
 import flask
@@ -73,6 +68,26 @@ class State(NamedTuple):
     chains: Table
     chains_map: Mapping[str, configlib.Chain]
     config: configlib.Config
+    sorted_chain_ids: List[str]
+    transactions_by_chain: Mapping[str, Table]
+    chains_by_id: Mapping[str, Table]
+    min_expirations: Mapping[str, datetime.date]
+
+
+def GetChainSummary(chain_id: str) -> Table:
+    """Get the summary row of a single chain, from the index."""
+    chain = STATE.chains_by_id.get(chain_id)
+    if chain is None:
+        chain = petl.wrap([STATE.chains.header()])
+    return chain
+
+
+def GetChainTransactions(chain_id: str) -> Table:
+    """Get the transactions of a single chain, from the index."""
+    txns = STATE.transactions_by_chain.get(chain_id)
+    if txns is None:
+        txns = petl.wrap([STATE.transactions.header()])
+    return txns
 
 
 def get_dict_attribute(mapping: Mapping[str, Any], attr: str, key: str) -> Any:
@@ -83,6 +98,13 @@ def get_dict_attribute(mapping: Mapping[str, Any], attr: str, key: str) -> Any:
 
 
 def Initialize():
+    global STATE
+
+    # Return the state without locking once it has been initialized. The lock
+    # below only guards against concurrent first initializations.
+    if STATE is not None:
+        return STATE
+
     # Make sure we have a configuration to work from.
     #
     # Note: We're reading the clean config produced by the import.
@@ -99,7 +121,6 @@ def Initialize():
     # config.
     ledger: str = os.getenv("JOHNNY_LEDGER")
 
-    global STATE
     with _STATE_LOCK:
         if STATE is None:
             app.logger.info(
@@ -135,17 +156,65 @@ def Initialize():
                 ).date()
                 chains_table = chains_table.selectge("maxdate", mindate)
 
-            chain_ids = set(chains_table.values("chain_id"))
+            # Read the chains once, instead of unpickling them on every request.
+            chains_table = petl.wrap(list(chains_table))
+            chain_ids = frozenset(chains_table.values("chain_id"))
+
+            # Index the chain summary rows by chain id.
+            chains_header = chains_table.header()
+            chains_id_index = chains_header.index("chain_id")
+            chains_by_id = {
+                row[chains_id_index]: petl.wrap([chains_header, row])
+                for row in chains_table.data()
+            }
 
             # Filter the transactions table removing ignored chains (from above).
             transactions = petl.frompickle(config.output.transactions_pickle).selectin(
                 "chain_id", chain_ids
             )
 
-            # Extract current positions from marks.
-            positions = transactions.selecteq("rowtype", txnlib.Type.Mark)
-
-            STATE = State(transactions, positions, chains_table, chains_map, config)
+            # Read the transactions once, indexing them by chain and extracting
+            # current positions from marks.
+            header = transactions.header()
+            chain_id_index = header.index("chain_id")
+            rowtype_index = header.index("rowtype")
+            txn_rows, position_rows = [header], [header]
+            chain_rows = collections.defaultdict(list)
+            for row in transactions.data():
+                txn_rows.append(row)
+                chain_rows[row[chain_id_index]].append(row)
+                if row[rowtype_index] == txnlib.Type.Mark:
+                    position_rows.append(row)
+            transactions = petl.wrap(txn_rows)
+            positions = petl.wrap(position_rows)
+            transactions_by_chain = {
+                chain_id: petl.wrap([header] + rows)
+                for chain_id, rows in chain_rows.items()
+            }
+
+            # Precompute the earliest expiration of each chain's positions.
+            min_expirations = {}
+            for chain_id, symbol in positions.cut("chain_id", "symbol").data():
+                expiration = instrument.FromString(symbol).expiration
+                if expiration and expiration < min_expirations.get(
+                    chain_id, datetime.date.max
+                ):
+                    min_expirations[chain_id] = expiration
+
+            # Precompute the list of chain ids sorted by underlying.
+            sorted_chain_ids = list(chains_table.sort("underlyings").values("chain_id"))
+
+            STATE = State(
+                transactions,
+                positions,
+                chains_table,
+                chains_map,
+                config,
+                sorted_chain_ids,
+                transactions_by_chain,
+                chains_by_id,
+                min_expirations,
+            )
             app.logger.info("Done.")
 
     return STATE
@@ -155,68 +224,101 @@ STATE = None
 _STATE_LOCK = threading.Lock()
 
 
-def ToHtmlString(ftable: Table, cls: str, ids: List[str] = None) -> bytes:
-    # Convert some set of tables to percents for display.
-    fieldnames = set(ftable.fieldnames())
-    table = ftable
-    for name, fmtfunc in [
-        ("vol_real", "{:.1%}".format),
-        ("return_real", "{:.1%}".format),
-        ("stdev_real", lambda v: v or ZERO),
-        ("vol_impl", "{:.1%}".format),
-        ("return_impl", "{:.1%}".format),
-        ("stdev_impl", lambda v: v or ZERO),
-    ]:
-        if name in fieldnames:
-            table = table.convert(name, fmtfunc)
-
-    sink = petl.MemorySource()
-    table.tohtml(sink, vrepr=vrepr)
-    html = sink.getvalue().decode("utf8")
-    html = re.sub(
-        "class='petl'", f"class='display compact nowrap cell-border' id='{cls}'", html
-    )
+# Conversions of some columns for display, e.g. to percents.
+_HTML_CONVERSIONS = {
+    "vol_real": "{:.1%}".format,
+    "return_real": "{:.1%}".format,
+    "stdev_real": lambda v: v or ZERO,
+    "vol_impl": "{:.1%}".format,
+    "return_impl": "{:.1%}".format,
+    "stdev_impl": lambda v: v or ZERO,
+}
+
+
+def ToHtmlString(ftable: Table, cls: str, ids: List[str] = None) -> str:
+    """Render a table to HTML."""
+    # Note: We emit the HTML directly in a single pass rather than rendering
+    # with petl and post-processing its output.
+    rows = iter(ftable)
+    header = tuple(next(rows))
+    conversions = [_HTML_CONVERSIONS.get(name) for name in header]
+    row_ids = itertools.chain(["header"], ids) if ids else None
+
+    def tr() -> str:
+        return "<tr>" if row_ids is None else '<tr id="{}">'.format(next(row_ids))
+
+    lines = [f"<table class='display compact nowrap cell-border' id='{cls}'>"]
+    append = lines.append
+
+    # Add class to <th> tags. Add column ids for each column of the header. We
+    # use this in JS to identify columns by name.
+    append("<thead>")
+    append(tr())
+    for fname in header:
+        append(f"<th class={fname}>{fname}</th>")
+    append("</tr>")
+    append("</thead>")
+
+    append("<tbody>")
+    ncols = len(header)
+    for row in rows:
+        append(tr())
+        cells = zip(conversions, row)
+        if len(row) != ncols:
+            # Render ragged rows as petl does: pad short rows with None and keep
+            # the cells past the header.
+            cells = itertools.chain(
+                cells,
+                zip(itertools.repeat(None), row[ncols:]),
+                itertools.repeat((None, None), ncols - len(row)),
+            )
+        for conv, value in cells:
+            if conv is not None:
+                value = conv(value)
+            if isinstance(value, _NUMERIC_TYPES) and not isinstance(value, bool):
+                append(f"<td style='text-align: right'>{vrepr(value)}</td>")
+            else:
+                append(f"<td>{vrepr(value)}</td>")
+        append("</tr>")
+    append("</tbody>")
 
-    # Add class to <th> tags.
-    fnames = iter(table.fieldnames())
-    html = re.sub(
-        "^<th>", lambda match: "<th class={}>".format(next(fnames)), html, flags=re.M
-    )
+    # Add a footer, for partial summaries.
+    append("<tfoot>")
+    append("<tr>")
+    for fname in header:
+        append(f'<th class="footcol-{fname}"></th>')
+    append("</tr>")
+    append("</tfoot>")
+    append("</table>")
+    append("")
 
-    # Add column ids for each column of the header. We use this in JS to
-    # identify columns by name.
-    if ids:
-        iter_ids = itertools.chain(["header"], iter(ids))
-        html = re.sub("<tr>", lambda _: '<tr id="{}">'.format(next(iter_ids)), html)
+    return "\n".join(lines)
 
-    # Add a footer, for partial summaries.
-    buf = io.StringIO()
-    pr = partial(print, file=buf)
-    pr(
-        "<tfoot>",
-    )
-    pr(
-        "<tr>",
-    )
-    for fname in table.fieldnames():
-        pr(f'<th class="footcol-{fname}"></th>')
-    pr("</tr>")
-    pr("</tfoot>")
-    html = re.sub("</table>", "{}</table>".format(buf.getvalue()), html)
 
-    return html
+_NUMERIC_TYPES = (int, float, Decimal)
 
 
 def vrepr(value: Any) -> str:
     """Universal rendering function, rendering decimals with commas."""
+    # Note: Most cells are strings; return those as is.
+    if type(value) is str:
+        return value
     if isinstance(value, Decimal):
-        sign, digits, exp = value.normalize().as_tuple()
-        return "{value:,.{width}f}".format(width=max(2, -exp), value=value)
+        exp = value.normalize().as_tuple().exponent
+        return f"{value:,.{max(2, -exp)}f}"
     return str(value)
 
 
 def GetNavigation() -> Dict[str, str]:
     """Get navigation bar."""
+    # Note: Return a copy, some callers add their own parameters to it.
+    return dict(_GetNavigationUrls(flask.request.script_root))
+
+
+@functools.lru_cache(maxsize=None)
+def _GetNavigationUrls(script_root: str) -> Dict[str, str]:
+    """Resolve the navigation bar URLs. These only depend on the root the app is
+    mounted under, which is part of the cache key."""
     return {
         "page_active": flask.url_for("active"),
         "page_expiring": flask.url_for("expiring"),
@@ -238,11 +340,82 @@ def AddUrl(endpoint: str, kwdarg: str, value: Any) -> str:
         return value
 
 
+@functools.lru_cache(maxsize=None)
+def ChainLink(chain_id: Optional[str]) -> Optional[str]:
+    """Render a link to a chain's page. Memoized, the set of chains is fixed."""
+    return AddUrl("chain", "chain_id", chain_id)
+
+
+def CachedResponse(mimetype: str, maxsize: int = 64):
+    """Memoize the body of a view on its arguments and query string.
+
+    The application state is immutable after initialization, so the rendered
+    bodies of views depending only on it can be reused across requests. A body
+    is rendered only once: concurrent requests for it wait for that rendering.
+    """
+
+    def decorator(func):
+        bodies = collections.OrderedDict()  # key -> Future of the body
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(**kwargs):
+            request = flask.request
+            key = (request.script_root, request.query_string, *sorted(kwargs.items()))
+            with lock:
+                future = bodies.get(key)
+                owner = future is None
+                if owner:
+                    future = bodies[key] = concurrent.futures.Future()
+                    if len(bodies) > maxsize:
+                        bodies.popitem(last=False)
+                else:
+                    bodies.move_to_end(key)
+
+            if owner:
+                try:
+                    future.set_result(func(**kwargs))
+                except BaseException as exc:
+                    # Don't memoize failures; let a later request try again.
+                    with lock:
+                        if bodies.get(key) is future:
+                            del bodies[key]
+                    future.set_exception(exc)
+                    raise
+            return flask.Response(future.result(), mimetype=mimetype)
+
+        return wrapper
+
+    return decorator
+
+
+def Prewarm(endpoint: str, **values):
+    """Render a memoized view in the background ahead of its request, e.g., for
+    embedded images. This is called from a request, whose root URL is reused."""
+    path = app.url_map.bind("localhost").build(endpoint, values)
+    future = _PREWARM_EXECUTOR.submit(_PrewarmView, flask.request.url_root, path)
+    future.add_done_callback(_LogPrewarmFailure)
+
+
+def _PrewarmView(base_url: str, path: str):
+    with app.test_request_context(path, base_url=base_url):
+        app.dispatch_request()
+
+
+def _LogPrewarmFailure(future: concurrent.futures.Future):
+    exc = future.exception()
+    if exc is not None:
+        app.logger.error("Error prewarming a view", exc_info=exc)
+
+
+_PREWARM_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=3)
+
+
 def FilterChains(table: Table) -> Table:
     """Filter down the list of chains from the params."""
     selected_chain_ids = flask.request.args.get("chain_ids")
     if selected_chain_ids:
-        selected_chain_ids = selected_chain_ids.split(",")
+        selected_chain_ids = frozenset(selected_chain_ids.split(","))
         table = table.selectin("chain_id", selected_chain_ids)
     return table
 
@@ -250,20 +423,63 @@ def FilterChains(table: Table) -> Table:
 # TODO(blais): Remove threshold, exclude non-trades from input.
 def RatioDistribution(num, denom, threshold=1000):
     """Compute a P/L percent distribution."""
-    mask = denom > 1e-6
-    num, denom = num[mask], denom[mask]
-    mask = (num < threshold) & (num > -threshold)
-    num, denom = num[mask], denom[mask]
-    return num / denom * 100
+    mask = (denom > 1e-6) & (num < threshold) & (num > -threshold)
+    return num[mask] / denom[mask] * 100
+
+
+@functools.lru_cache(maxsize=None)
+def ImportPlotting():
+    """Import and configure the plotting libraries, on first use.
+
+    These are slow to import and only needed by the image handlers.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import seaborn as sns
+
+    sns.set()
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    return matplotlib, Figure, FigureCanvasAgg
+
+
+@contextlib.contextmanager
+def GetFigure(name: str, figsize: Tuple[float, float] = None) -> Iterator[Any]:
+    """Check out a cleared figure to plot to, and return it to a pool after.
+
+    Allocating a new figure and canvas has a large fixed cost. We keep a pool
+    of them per plot type; a figure is only ever drawn to by one request.
+    """
+    matplotlib, Figure, FigureCanvas = ImportPlotting()
+    with _FIGURES_LOCK:
+        pool = _FIGURES[name]
+    try:
+        fig = pool.get_nowait()
+    except queue.Empty:
+        fig = Figure()
+        FigureCanvas(fig)
+    fig.clear()
+    fig.set_size_inches(figsize or matplotlib.rcParams["figure.figsize"])
+    try:
+        yield fig
+    finally:
+        pool.put(fig)
+
+
+_FIGURES = collections.defaultdict(queue.SimpleQueue)
+_FIGURES_LOCK = threading.Lock()
 
 
 def RenderHistogram(data: np.array, title: str) -> bytes:
-    fig, ax = pyplot.subplots(figsize=(6, 3))
-    fig.tight_layout()
-    ax.set_title(title)
-    ax.hist(data, bins="auto", edgecolor="black", linewidth=0.5)
-    buf = io.BytesIO()
-    FigureCanvas(fig).print_png(buf)
+    with GetFigure("histogram", (6, 3)) as fig:
+        ax = fig.add_subplot()
+        fig.tight_layout()
+        ax.set_title(title)
+        ax.hist(data, bins="auto", edgecolor="black", linewidth=0.5)
+        buf = io.BytesIO()
+        fig.canvas.print_png(buf)
     return buf.getvalue()
 
 
@@ -288,38 +504,47 @@ def resource_not_found(e):
 
 def render_chains(chains: Table) -> flask.Response:
     ids = chains.values("chain_id")
-    chains = chains.convert("chain_id", partial(AddUrl, "chain", "chain_id"))
+    chains = chains.convert("chain_id", ChainLink)
     return flask.render_template(
         "chains.html", table=ToHtmlString(chains, "chains", ids), **GetNavigation()
     )
 
 
 @app.route("/active")
+@CachedResponse("text/html")
 def active():
     return render_chains(STATE.chains.selectin("status", {"ACTIVE"}))
 
 
 @app.route("/expiring")
 def expiring():
+    # Note: The page depends on the current date, which is part of its cache key.
+    return expiring_at(today=datetime.date.today())
+
+
+@CachedResponse("text/html")
+def expiring_at(today: datetime.date):
     days = int(flask.request.args.get("days", 20))
-    today = datetime.date.today()
-    min_dte = (
-        STATE.transactions.selecteq("rowtype", txnlib.Type.Mark)
-        .applyfn(instrument.Expand, "symbol")
-        .selecttrue("expiration")
-        .addfield("dte", lambda r: (r.expiration - today).days)
-        .selectle("dte", days)
-        .aggregate("chain_id", {"min_dte": ("dte", min)})
-    )
+
+    # Compute the minimum days to expiration per chain from the precomputed
+    # earliest expirations.
+    chain_min_dte = {}
+    for chain_id, expiration in STATE.min_expirations.items():
+        dte = (expiration - today).days
+        if dte <= days:
+            chain_min_dte[chain_id] = dte
+    min_dte = petl.wrap([("chain_id", "min_dte")] + sorted(chain_min_dte.items()))
     return render_chains(STATE.chains.join(min_dte, "chain_id").movefield("min_dte", 1))
 
 
 @app.route("/chains")
+@CachedResponse("text/html")
 def chains():
     return render_chains(STATE.chains)
 
 
 @app.route("/chain/<chain_id>")
+@CachedResponse("text/html")
 def chain(chain_id: str):
     # Get the chain object from the configuration.
     chain_obj = STATE.chains_map.get(chain_id)
@@ -327,10 +552,10 @@ def chain(chain_id: str):
         flask.abort(404, description=f"Chain '{chain_id}' not found")
 
     # Isolate the chain summary data.
-    chain = STATE.chains.selecteq("chain_id", chain_id)
+    chain = GetChainSummary(chain_id)
 
     # Isolate the chain transactional data.
-    txns = STATE.transactions.selecteq("chain_id", chain_id)
+    txns = GetChainTransactions(chain_id)
     txns = instrument.Expand(txns, "symbol")
 
     # Get the corresponding set of matches.
@@ -338,21 +563,18 @@ def chain(chain_id: str):
         txns, match.ShortBasisReportingMethod.INVERT
     )
 
-    # Split up P/L from static and dynamic deltas.
-    static, dynamic = txns.biselect(
-        lambda r: r.instype in {"Equity", "Future", "Crypto"}
-    )
+    # Split up P/L from static and dynamic deltas, in a single pass.
+    static, dynamic, cash = [], [], []
+    for instype, cost, cash_amount in txns.cut("instype", "cost", "cash").data():
+        (static if instype in {"Equity", "Future", "Crypto"} else dynamic).append(cost)
+        cash.append(cash_amount)
 
-    def agg_field(table, fieldname):
-        agg_table = table.aggregate(None, {fieldname: (fieldname, sum)})
-        values = agg_table.values(fieldname)
-        if not values:
-            return ZERO
-        return next(iter(values)).quantize(Q)
+    def agg_field(values: List[Decimal]) -> Decimal:
+        return sum(values).quantize(Q) if values else ZERO
 
-    pnl_static = agg_field(static, "cost")
-    pnl_dynamic = agg_field(dynamic, "cost")
-    pnl_cash = agg_field(txns, "cash")
+    pnl_static = agg_field(static)
+    pnl_dynamic = agg_field(dynamic)
+    pnl_cash = agg_field(cash)
 
     # TODO(blais): Implement SVG and isolate its rendering to a function.
     history_html = RenderHistoryText(txns) if 1 else RenderHistorySVG(txns)
@@ -386,11 +608,11 @@ def bchain(chain_id: str):
     chain_obj = STATE.chains_map.get(chain_id)
 
     # Isolate the chain summary data.
-    chain = STATE.chains.selecteq("chain_id", chain_id)
+    chain = GetChainSummary(chain_id)
     chain = next(iter(chain.records()))
 
     # Isolate the chain transactional data.
-    txns = STATE.transactions.selecteq("chain_id", chain_id)
+    txns = GetChainTransactions(chain_id)
     txns = instrument.Expand(txns, "symbol")
 
     # Render to text.
@@ -428,76 +650,70 @@ def chain_proto(chain_id: str):
 
 
 @app.route("/chain_protos")
+@CachedResponse("text/plain")
 def chain_protos():
     chains_table = FilterChains(STATE.chains)
     chains_db = configlib.Chains()
     for rec in chains_table.records():
         chains_db.chains.add().CopyFrom(STATE.chains_map.get(rec.chain_id))
-    response = flask.make_response(configlib.ToText(chains_db), 200)
-    response.mimetype = "text/plain"
-    return response
+    return configlib.ToText(chains_db)
 
 
 @app.route("/chain_names")
+@CachedResponse("text/plain")
 def chain_names():
-    chains_table = FilterChains(STATE.chains)
-    buf = io.StringIO()
-    pr = functools.partial(print, file=buf)
-    for rec in chains_table.sort("underlyings").records():
-        pr(rec.chain_id)
-    response = flask.make_response(buf.getvalue(), 200)
-    response.mimetype = "text/plain"
-    return response
+    chain_ids = STATE.sorted_chain_ids
+    selected_chain_ids = flask.request.args.get("chain_ids")
+    if selected_chain_ids:
+        selected_chain_ids = set(selected_chain_ids.split(","))
+        chain_ids = [cid for cid in chain_ids if cid in selected_chain_ids]
+    return "".join(f"{chain_id}\n" for chain_id in chain_ids)
 
 
 def RenderHistoryText(txns: Table) -> str:
     """Render trade history to text."""
-    buf = io.StringIO()
 
-    fmt = "{r.instruction}/{r.effect} {r.quantity} {r.symbol} @ {r.price}"
-
-    def RenderStatic(rows):
-        return "; ".join(fmt.format(r=row) for row in rows if row.putcall is None)
-
-    def RenderPuts(rows):
-        return "; ".join(
-            fmt.format(r=row) for row in rows if row.putcall and row.putcall[0] == "P"
-        )
-
-    def RenderCalls(rows):
-        return "; ".join(
-            fmt.format(r=row) for row in rows if row.putcall and row.putcall[0] == "C"
-        )
+    # Render the static, put and call legs of each order in a single pass.
+    def RenderOrder(key, rows):
+        static, puts, calls = [], [], []
+        cost = 0
+        for r in rows:
+            cost += r.cost
+            if r.putcall is None:
+                legs = static
+            elif r.putcall[:1] == "P":
+                legs = puts
+            elif r.putcall[:1] == "C":
+                legs = calls
+            else:
+                continue
+            legs.append(
+                f"{r.instruction}/{r.effect} {r.quantity} {r.symbol} @ {r.price}"
+            )
+        return key + ("; ".join(static), "; ".join(puts), "; ".join(calls), cost)
 
     def Accrue(prv, cur, _) -> Decimal:
         last = prv.accr if prv else ZERO
         return last + cur.cost
 
-    agg = {
-        "static": (None, RenderStatic),
-        "puts": (None, RenderPuts),
-        "calls": (None, RenderCalls),
-        "cost": ("cost", sum),
-    }
-    rendered_rows = txns.aggregate(["datetime", "order_id"], agg).addfieldusingcontext(
-        "accr", Accrue
-    )
-    pr = functools.partial(print, file=buf)
-    pr("<pre>")
-    pr(rendered_rows.lookallstr())
-    pr("</pre>")
-
-    return buf.getvalue()
+    rendered_rows = txns.rowreduce(
+        ["datetime", "order_id"],
+        RenderOrder,
+        header=["datetime", "order_id", "static", "puts", "calls", "cost"],
+    ).addfieldusingcontext("accr", Accrue)
+    return "<pre>\n{}\n</pre>\n".format(rendered_rows.lookallstr())
 
 
 def RenderHistorySVG(txns: Table) -> str:
     """Render an SVG version of the chains history."""
 
     # Figure out parameters to scale for rendering.
-    clean_txns = txns.sort(["datetime", "strike"]).cut(
-        "datetime", "description", "strike", "cost"
+    clean_txns = list(
+        txns.sort(["datetime", "strike"])
+        .cut("datetime", "description", "strike", "cost")
+        .records()
     )
-    strikes = {strike for strike in clean_txns.values("strike") if strike is not None}
+    strikes = {r.strike for r in clean_txns if r.strike is not None}
     if not strikes:
         return "No transactions."
     min_strike = min(strikes)
@@ -507,8 +723,8 @@ def RenderHistorySVG(txns: Table) -> str:
         diff_strike = 1
     width = 1000
 
-    svg = io.StringIO()
-    pr = partial(print, file=svg)
+    lines = []
+    pr = lines.append
 
     pr(f'<svg viewBox="-150 0 1300 1500" xmlns="http://www.w3.org/2000/svg">')
     pr("<style>")
@@ -530,11 +746,11 @@ def RenderHistorySVG(txns: Table) -> str:
             f'<line x1="{x}" y1="2" x2="{x}" y2="6" style="stroke:#333333;stroke-width:0.5" />'
         )
         pr(f'<text text-anchor="middle" x="{x}" y="12" class="small">{strike}</text>')
-    pr()
+    pr("")
 
     y = 20
     prev_time = None
-    for r in clean_txns.sort("datetime").records():
+    for r in clean_txns:
         if prev_time is not None and prev_time != r.datetime:
             y += 30
         # print(rec, file=svg)
@@ -547,12 +763,14 @@ def RenderHistorySVG(txns: Table) -> str:
         y += 12
 
     pr("</svg>")
-    return svg.getvalue()
+    pr("")
+    return "\n".join(lines)
 
 
 @app.route("/chain/<chain_id>/graph.png")
+@CachedResponse("image/png")
 def chain_graph(chain_id: str):
-    txns = STATE.transactions.selecteq("chain_id", chain_id)
+    txns = GetChainTransactions(chain_id)
     txns = instrument.Expand(txns, "symbol")
     graph = chainslib.CreateGraph(txns, [STATE.chains_map[chain_id]])
 
@@ -568,17 +786,13 @@ def chain_graph(chain_id: str):
 
     agraph = nx.nx_agraph.to_agraph(graph)
     agraph.layout("dot")
-    with tempfile.NamedTemporaryFile(suffix=".png", mode="w") as tmp:
-        agraph.draw(tmp.name)
-        tmp.flush()
-        with open(tmp.name, "rb") as infile:
-            contents = infile.read()
-    return flask.Response(contents, mimetype="image/png")
+    return agraph.draw(format="png")
 
 
 @app.route("/transactions")
+@CachedResponse("text/html")
 def transactions():
-    table = STATE.transactions.convert("chain_id", partial(AddUrl, "chain", "chain_id"))
+    table = STATE.transactions.convert("chain_id", ChainLink)
     return flask.render_template(
         "transactions.html",
         table=ToHtmlString(table, "transactions"),
@@ -587,6 +801,7 @@ def transactions():
 
 
 @app.route("/positions")
+@CachedResponse("text/html")
 def positions():
     return flask.render_template(
         "positions.html",
@@ -610,24 +825,28 @@ def GetNotional(rec: Record) -> Decimal:
     return notional.quantize(Q)
 
 
-@app.route("/stats/")
-def stats():
-    # Compute stats on winners and losers.
-    orig_chains = FilterChains(STATE.chains)
+@functools.lru_cache(maxsize=64)
+def GetStatsTable(chain_ids: Optional[str]) -> Table:
+    """Compute the summary stats on winners and losers for a chain selection."""
+    chains = STATE.chains
+    if chain_ids:
+        chains = chains.selectin("chain_id", frozenset(chain_ids.split(",")))
 
-    def PctCr(rec: Record):
-        return 0 if rec.init == 0 else rec.pnl_chain / rec.init
+    # Extract the columns of interest in a single pass over the chains.
+    pnl_values, init_values, pct_cr_values = [], [], []
+    for pnl_chain, init in chains.cut("pnl_chain", "init").data():
+        pnl_values.append(pnl_chain)
+        init_values.append(init)
+        pct_cr_values.append(0 if init == 0 else pnl_chain / init)
 
-    chains = orig_chains.addfield("pct_cr", PctCr)
-    win, los = chains.biselect(lambda r: r.pnl_chain > 0)
-    pnl = np.array(chains.values("pnl_chain"))
-    pnl_win = np.array(win.values("pnl_chain"))
-    pnl_los = np.array(los.values("pnl_chain"))
-    init_cr = np.array(chains.values("init"))
+    pnl = np.array(pnl_values)
+    init_cr = np.array(init_values)
+    pct_cr = np.array(pct_cr_values)
 
-    pct_cr = np.array(chains.values("pct_cr"))
-    pct_cr_win = np.array(win.values("pct_cr"))
-    pct_cr_los = np.array(los.values("pct_cr"))
+    # Split up winners and losers.
+    win = np.array([value > 0 for value in pnl_values], dtype=bool)
+    pnl_win, pnl_los = pnl[win], pnl[~win]
+    pct_cr_win, pct_cr_los = pct_cr[win], pct_cr[~win]
 
     def Quantize(value):
         return Decimal(value).quantize(Decimal("0"))
@@ -683,45 +902,61 @@ def stats():
             "",  #'Max %cr los'
         ],
     ]
-    stats_table = petl.wrap(rows)
+    return petl.wrap(rows)
+
 
+@app.route("/stats/")
+@CachedResponse("text/html")
+def stats():
+    orig_chains = FilterChains(STATE.chains)
     chain_ids = flask.request.args.get("chain_ids")
+    stats_table = GetStatsTable(chain_ids)
+
+    pnlhist = flask.url_for("stats_pnlhist", chain_ids=chain_ids)
+    pnlpctinit = flask.url_for("stats_pnlpctinit", chain_ids=chain_ids)
+    pnlinit = flask.url_for("stats_pnlinit", chain_ids=chain_ids)
+
+    # Render the histograms concurrently in the background, so they are cached
+    # by the time the browser requests them.
+    for endpoint in "stats_pnlhist", "stats_pnlpctinit", "stats_pnlinit":
+        Prewarm(endpoint, chain_ids=chain_ids)
+
     return flask.render_template(
         "stats.html",
         stats_table=ToHtmlString(stats_table, "stats"),
         chains=ToHtmlString(orig_chains, "chains"),
-        pnlhist=flask.url_for("stats_pnlhist", chain_ids=chain_ids),
-        pnlpctinit=flask.url_for("stats_pnlpctinit", chain_ids=chain_ids),
-        pnlinit=flask.url_for("stats_pnlinit", chain_ids=chain_ids),
+        pnlhist=pnlhist,
+        pnlpctinit=pnlpctinit,
+        pnlinit=pnlinit,
         **GetNavigation(),
     )
 
 
 @app.route("/stats/pnlhist.png")
+@CachedResponse("image/png")
 def stats_pnlhist():
     chains = FilterChains(STATE.chains)
-    pnl = np.array(chains.values("pnl_chain"))
-    pnl = [v for v in pnl if -10000 < v < 10000]
-    image = RenderHistogram(pnl, "P/L ($)")
-    return flask.Response(image, mimetype="image/png")
+    pnl = np.array(chains.values("pnl_chain")).astype(float)
+    pnl = pnl[(pnl > -10000) & (pnl < 10000)]
+    return RenderHistogram(pnl, "P/L ($)")
 
 
 @app.route("/stats/pnlpctinit.png")
+@CachedResponse("image/png")
 def stats_pnlpctinit():
     chains = FilterChains(STATE.chains)
     pnl = np.array(chains.values("pnl_chain")).astype(float)
     creds = np.array(chains.values("init")).astype(float)
     data = RatioDistribution(pnl, creds)
-    image = RenderHistogram(data, "P/L (%/Initial Credits)")
-    return flask.Response(image, mimetype="image/png")
+    return RenderHistogram(data, "P/L (%/Initial Credits)")
 
 
 @app.route("/stats/pnlinit.png")
+@CachedResponse("image/png")
 def stats_pnlinit():
     chains = FilterChains(STATE.chains)
     init = np.array(chains.values("init")).astype(float)
-    image = RenderHistogram(init, "Initial Credits ($)")
-    return flask.Response(image, mimetype="image/png")
+    return RenderHistogram(init, "Initial Credits ($)")
 
 
 @app.route("/recap")
@@ -732,11 +967,12 @@ def recap_today():
 
 
 @app.route("/recap/<date>")
+@CachedResponse("text/html")
 def recap(date: str):
     date = dateutil.parser.parse(date).date()
     chains = recaplib.get_chains_at_date(
         STATE.transactions, STATE.chains, STATE.chains_map, date
-    ).convert("chain_id", partial(AddUrl, "chain", "chain_id"))
+    ).convert("chain_id", ChainLink)
     summary = recaplib.get_summary(chains)
     params = GetNavigation()
     params["date"] = date
@@ -760,13 +996,17 @@ def recap(date: str):
 
 @app.route("/timeline")
 def timeline():
-    return flask.render_template(
-        "timeline.html",
-        timeline_group_png=flask.url_for("timeline_group_png"),
-        timeline_strategy_png=flask.url_for("timeline_strategy_png"),
-        timeline_account_png=flask.url_for("timeline_account_png"),
-        **GetNavigation(),
-    )
+    urls = {
+        name: flask.url_for(name)
+        for name in (
+            "timeline_group_png",
+            "timeline_strategy_png",
+            "timeline_account_png",
+        )
+    }
+    for endpoint in urls:
+        Prewarm(endpoint)
+    return flask.render_template("timeline.html", **urls, **GetNavigation())
 
 
 def get_timeline_chains():
@@ -776,41 +1016,59 @@ def get_timeline_chains():
     )
 
 
-def plot_timeline(chains: Table, fieldname: str) -> flask.Response:
+def plot_timeline(chains: Table, fieldname: str) -> bytes:
     """Plot a timeline of one of a few supported breakdown types."""
 
-    # Build a pivot table by date.
-    total = chains.cut("maxdate", "pnl_chain").aggregate(
-        "maxdate", {"pnl_day": ("pnl_chain", sum)}
+    # Convert to Pandas and build a pivot table by date. Chains without a value
+    # for the breakdown count in the total, but not as a series of their own.
+    df = chains.cut("maxdate", fieldname, "pnl_chain").todataframe()
+    df_total = (
+        df.groupby("maxdate")[["pnl_chain"]]
+        .sum()
+        .rename(columns={"pnl_chain": "pnl_day"})
+        .cumsum()
+    )
+    df = df.dropna(subset=[fieldname])
+    df[fieldname] = df[fieldname].astype(str)
+    df_pivot = (
+        df.pivot_table(
+            index="maxdate",
+            columns=fieldname,
+            values="pnl_chain",
+            aggfunc="sum",
+            fill_value=0,
+        )
+        .reindex(df_total.index, fill_value=0)
+        .cumsum()
     )
-    pivot = chains.pivot("maxdate", fieldname, "pnl_chain", sum).replaceall(None, 0)
-
-    # Convert to Pandas and plot.
-    df_total = total.todataframe().set_index("maxdate").cumsum()
-    df_pivot = pivot.todataframe().set_index("maxdate").cumsum()
 
-    fig, ax = pyplot.subplots()
-    pyplot.tight_layout()
-    df_total.plot(ax=ax, figsize=(24, 12), linewidth=3)
-    df_pivot.plot(ax=ax, figsize=(24, 8))
-    buf = io.BytesIO()
-    FigureCanvas(fig).print_png(buf)
-    return flask.Response(buf.getvalue(), mimetype="image/png")
+    with GetFigure("timeline") as fig:
+        ax = fig.add_subplot()
+        fig.tight_layout()
+        df_total.plot(ax=ax, figsize=(24, 12), linewidth=3)
+        if not df_pivot.empty:
+            df_pivot.plot(ax=ax, figsize=(24, 8))
+        buf = io.BytesIO()
+        fig.canvas.print_png(buf)
+    return buf.getvalue()
 
 
 @app.route("/timeline_group.png")
+@CachedResponse("image/png")
 def timeline_group_png():
     chains = get_timeline_chains()
     return plot_timeline(chains, "group")
 
 
 @app.route("/timeline_strategy.png")
+@CachedResponse("image/png")
 def timeline_strategy_png():
     chains = get_timeline_chains()
     return plot_timeline(chains, "strategy")
 
 
 @app.route("/timeline_account.png")
+@CachedResponse("image/png")
 def timeline_account_png():
     chains = get_timeline_chains()
     return plot_timeline(chains, "account")
@@ -850,12 +1108,21 @@ def get_upside_notional(r: Record) -> Decimal:
 
 
 @app.route("/leverage")
+@CachedResponse("text/html")
 def leverage():
     # Calculate notional equivalent exposure for all positions.
     notional = (
         STATE.positions
         # Convert Mark rows to position quantities.
-        .applyfn(instrument.Expand, "symbol")
+        .applyfn(
+            instrument.Expand,
+            "symbol",
+            "instype",
+            "underlying",
+            "putcall",
+            "strike",
+            "multiplier",
+        )
         .addfield("squantity", get_signed_quantity)
         .cutout("instruction", "quantity")
         # Compute the put/call notional risks associated with the position.
@@ -887,6 +1154,8 @@ def leverage():
             "notional_down",
             "notional_up",
         )
+        # Note: This is rendered and further aggregated three times below.
+        .cache()
     )
 
     def aggregate(field: str):